@@ -1,16 +1,20 @@
 import argparse
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 import os
-import googleapiclient.discovery
 import glob
+import json
+
+# Biblioteki Google są importowane dopiero w funkcjach, które ich używają,
+# żeby --help i błędy brakujących plików nie czekały na ich wczytanie
 
 # Określ uprawnienia
 SCOPES = ['https://www.googleapis.com/auth/blogger']
 
 # Funkcja do uwierzytelnienia
 def authenticate():
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     creds = None
     # Sprawdź, czy istnieją zapisane poświadczenia
     if os.path.exists('token.json'):
@@ -48,6 +52,8 @@ def replace_ingredients(template, ingredients):
 
 # Funkcja do publikacji posta jako szkic
 def publish_post(blog_id, title, content, is_draft=True):
+    import googleapiclient.discovery
+
     service = googleapiclient.discovery.build('blogger', 'v3', credentials=authenticate())
     post = {
         'title': title,
@@ -66,16 +72,29 @@ def find_file(extension):
     else:
         raise FileNotFoundError(f"Nie znaleziono pliku {extension} lub znaleziono więcej niż jeden.")
 
+# Funkcja do znalezienia pliku po kluczu w indeksie katalogu roboczego filmu
+# (index.json tworzony przez yt-dlp/yt_caption_uploader.py, np. work/<video_id>)
+def find_in_workspace(workspace, key):
+    with open(os.path.join(workspace, 'index.json'), 'r', encoding='utf-8') as file:
+        index = json.load(file)
+    if key not in index:
+        raise FileNotFoundError(f"Brak pliku {key} w indeksie katalogu {workspace}.")
+    return os.path.join(workspace, index[key])
+
 # Główna funkcja skryptu
-def main(blog_id, youtube_url):
+def main(blog_id, youtube_url, workspace=None):
     # Wczytanie szablonu HTML
     html_template = '''
     <p>&nbsp;</p><h2><b>🛒 Ingredients:</b></h2><p>TU SKLADNIKI</p><h2>🔪 Preparation:</h2><p>TU PRZYGOTOWANIE</p><h2>🔗&nbsp;Links:</h2><div><div>Facebook:&nbsp; &nbsp;<a href="https://www.facebook.com/KulinarneePrzygody/" target="_blank">https://www.facebook.com/KulinarneePrzygody/</a></div><div>Instagram:&nbsp;&nbsp;<a href="https://www.instagram.com/kulinarneprzygody_/" target="_blank">https://www.instagram.com/kulinarneprzygody_/</a></div><div>&nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp;</div><div>Blog:&nbsp; &nbsp; &nbsp; &nbsp; &nbsp;&nbsp;<a href="https://kulinarneeprzygody.blogspot.com/" target="_blank">https://kulinarneeprzygody.blogspot.com/</a></div><div><span>&nbsp;&nbsp; &nbsp;</span><span>&nbsp;&nbsp; &nbsp;</span><span>&nbsp;&nbsp; &nbsp;</span><span>&nbsp;&nbsp; &nbsp;</span><span>&nbsp; &nbsp;</span><a href="https://www.kulinarneprzygody.com/" target="_blank">https://www.kulinarneprzygody.com/</a>&nbsp; &nbsp; &nbsp; &nbsp; &nbsp;&nbsp;</div><div>Pinterest&nbsp; &nbsp; &nbsp;<a href="https://pl.pinterest.com/mnawrolska/kulinarne-przygody/" target="_blank">https://pl.pinterest.com/mnawrolska/kulinarne-przygody/</a></div></div><div><br /></div><h2>&nbsp;📺&nbsp;Watch on YouTube:</h2><div class="separator" style="clear: both; text-align: center;"><iframe allowfullscreen="" class="BLOG_video_class" height="380" src="https://www.youtube.com/embed/TU_ID" width="551" youtube-src-id="TU_ID"></iframe></div><br /><p><br /></p>
     '''
 
     # Znalezienie plików z tytułem i składnikami
-    ingredients_file = find_file('description.eng')
-    title_file = find_file('title.eng')
+    if workspace:
+        ingredients_file = find_in_workspace(workspace, 'description:en')
+        title_file = find_in_workspace(workspace, 'title:en')
+    else:
+        ingredients_file = find_file('description.eng')
+        title_file = find_file('title.eng')
 
     # Wczytanie składników i tytułu z plików
     ingredients = load_file_content(ingredients_file)
@@ -93,9 +112,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Automatyczna publikacja posta na Bloggerze.")
     parser.add_argument("blog_id", type=str, help="Identyfikator bloga.")
     parser.add_argument("youtube_url", type=str, help="URL filmu na YouTube.")
+    parser.add_argument("--workspace", type=str,
+                        help="Katalog roboczy filmu z index.json (np. work/<video_id>) zamiast szukania plików w bieżącym katalogu.")
     
     # Parsowanie argumentów
     args = parser.parse_args()
 
     # Uruchomienie głównej funkcji
-    main(args.blog_id, args.youtube_url)
+    main(args.blog_id, args.youtube_url, args.workspace)
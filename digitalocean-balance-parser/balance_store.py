@@ -0,0 +1,180 @@
+import calendar
+import json
+import sqlite3
+import time
+
+from datetime import datetime, timezone
+
+DEFAULT_DB_PATH = "balances.sqlite"
+
+DAY = 86400
+
+def parse_timestamp(value):
+    """
+    Unix time of an ISO 8601 timestamp such as doctl's generated_at, or None.
+    """
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def month_bounds(timestamp):
+    """
+    (start of the UTC month containing `timestamp`, start of the previous month, days in the month).
+    """
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    start = datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+    previous = datetime(moment.year - (moment.month == 1), (moment.month - 2) % 12 + 1, 1, tzinfo=timezone.utc)
+    return start.timestamp(), previous.timestamp(), calendar.monthrange(moment.year, moment.month)[1]
+
+class BalanceStore:
+    """
+    Append-only history of account balance snapshots in SQLite.
+    Every query looks up single rows through the (account, taken_at) index, so
+    trends stay fast however many years of snapshots the file holds.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " account TEXT NOT NULL,"
+            " taken_at REAL NOT NULL,"
+            " month_to_date_balance REAL,"
+            " account_balance REAL,"
+            " month_to_date_usage REAL,"
+            " data TEXT NOT NULL)"
+        )
+        # Also makes the same snapshot (same account and generated_at) impossible to store twice
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS snapshots_account_time ON snapshots (account, taken_at)")
+        self._conn.commit()
+
+    def add(self, account, data, taken_at=None):
+        """
+        Append a snapshot (doctl balance JSON). Returns False when it was already stored.
+        """
+        if taken_at is None:
+            taken_at = parse_timestamp(data.get("generated_at")) or time.time()
+
+        def number(key):
+            value = data.get(key)
+            return float(value) if value not in (None, "") else None
+
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO snapshots (account, taken_at, month_to_date_balance, account_balance,"
+            " month_to_date_usage, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (account, taken_at, number("month_to_date_balance"), number("account_balance"),
+             number("month_to_date_usage"), json.dumps(data, ensure_ascii=False))
+        )
+        self._conn.commit()
+        return cursor.rowcount == 1
+
+    def accounts(self):
+        # Skip scan over the index: one step per account instead of one per row
+        rows = self._conn.execute(
+            "WITH RECURSIVE names(account) AS ("
+            " SELECT MIN(account) FROM snapshots"
+            " UNION ALL"
+            " SELECT (SELECT MIN(account) FROM snapshots WHERE account > names.account) FROM names"
+            " WHERE names.account IS NOT NULL)"
+            " SELECT account FROM names WHERE account IS NOT NULL"
+        ).fetchall()
+        return [row["account"] for row in rows]
+
+    def latest(self, account, before=None):
+        """
+        The newest snapshot of `account` taken before `before` (or at all), or None.
+        """
+        return self._conn.execute(
+            "SELECT * FROM snapshots WHERE account = ? AND taken_at < ? ORDER BY taken_at DESC LIMIT 1",
+            (account, float("inf") if before is None else before)
+        ).fetchone()
+
+    def account_trend(self, account):
+        """
+        Month-to-date usage, change since the previous snapshot, daily burn rate,
+        projected end-of-month cost and last month's usage for one account.
+        """
+        latest = self.latest(account)
+        if latest is None or latest["month_to_date_usage"] is None:
+            return None
+        month_start, previous_month_start, days_in_month = month_bounds(latest["taken_at"])
+        usage = latest["month_to_date_usage"]
+
+        # Usage restarts every month, so the first snapshot of a month counts from zero
+        previous = self.latest(account, before=latest["taken_at"])
+        if previous is not None and previous["taken_at"] >= month_start:
+            delta = usage - (previous["month_to_date_usage"] or 0.0)
+        else:
+            delta = usage
+
+        # At least one day elapsed, so a snapshot taken minutes into a month does not explode the projection
+        elapsed_days = max((latest["taken_at"] - month_start) / DAY, 1.0)
+        burn = usage / elapsed_days
+
+        # The last snapshot of the previous month may be from mid-month: its burn rate is taken over the
+        # days it covers, and it only counts as last month's total when taken on the month's last day
+        last_month = self.latest(account, before=month_start)
+        if last_month is not None and last_month["taken_at"] >= previous_month_start:
+            last_month_total = last_month["month_to_date_usage"] or 0.0
+            last_month_days = max((last_month["taken_at"] - previous_month_start) / DAY, 1.0)
+            last_month_until = last_month["taken_at"]
+        else:
+            last_month_total, last_month_days, last_month_until = None, None, None
+
+        return {
+            "taken_at": latest["taken_at"],
+            "previous_at": previous["taken_at"] if previous is not None else None,
+            "month_start": month_start,
+            "usage": usage,
+            "delta": delta,
+            "burn_per_day": burn,
+            "projected": burn * days_in_month,
+            "last_month_total": last_month_total,
+            "last_month_until": last_month_until,
+            "last_month_complete": last_month_until is not None and last_month_until >= month_start - DAY,
+            "last_month_burn_per_day": last_month_total / last_month_days if last_month_total is not None else None,
+        }
+
+    def trends(self, accounts=None):
+        """
+        Trends of every account (or of `accounts`) and their totals for the newest month on record.
+        Accounts whose newest snapshot is from an older month are left out of the totals.
+        """
+        per_account = {}
+        for account in accounts if accounts is not None else self.accounts():
+            trend = self.account_trend(account)
+            if trend is not None:
+                per_account[account] = trend
+        if not per_account:
+            return {"accounts": {}, "totals": None}
+
+        month_start = max(trend["month_start"] for trend in per_account.values())
+        current = [trend for trend in per_account.values() if trend["month_start"] == month_start]
+        with_last_month = [trend for trend in current if trend["last_month_total"] is not None]
+        totals = {
+            "usage": sum(trend["usage"] for trend in current),
+            "burn_per_day": sum(trend["burn_per_day"] for trend in current),
+            "projected": sum(trend["projected"] for trend in current),
+            "last_month_total": sum(trend["last_month_total"] for trend in with_last_month) if with_last_month else None,
+            "last_month_until": min(trend["last_month_until"] for trend in with_last_month) if with_last_month else None,
+            "last_month_complete": all(trend["last_month_complete"] for trend in with_last_month),
+            "last_month_burn_per_day": sum(trend["last_month_burn_per_day"] for trend in with_last_month)
+            if with_last_month else None,
+            "burn_change": None,
+        }
+        # Month over month only between accounts that have both months on record
+        if totals["last_month_burn_per_day"]:
+            comparable_burn = sum(trend["burn_per_day"] for trend in with_last_month)
+            totals["burn_change"] = comparable_burn / totals["last_month_burn_per_day"] - 1
+        return {"accounts": per_account, "totals": totals}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import requests
+
+EXCHANGE_API_URL = "https://open.er-api.com/v6/latest/{base}"
+
+# Not *.json, so the summary script does not mistake the cache for account data
+DEFAULT_CACHE_PATH = "exchange_rates.cache"
+DEFAULT_TTL_HOURS = 12
+DEFAULT_MAX_STALE_DAYS = 7
+DEFAULT_TIMEOUT = 3
+
+class ExchangeRateProvider:
+    """
+    Exchange rates from open.er-api.com with an on-disk cache.
+    Rates younger than `ttl` seconds are served from the cache without any network call.
+    When a refresh fails or times out, a cached rate up to `max_stale` seconds old is
+    served instead, together with a note saying how old it is.
+    """
+
+    def __init__(self, base="USD", cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_HOURS * 3600,
+                 max_stale=DEFAULT_MAX_STALE_DAYS * 86400, timeout=DEFAULT_TIMEOUT, offline=False):
+        self.base = base.upper()
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.offline = offline
+        self._loaded = None
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cache.get("base") != self.base or not isinstance(cache.get("rates"), dict):
+            return None
+        return cache
+
+    def _save_cache(self, cache):
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(temp_path, self.cache_path)
+
+    def _fetch(self):
+        response = requests.get(EXCHANGE_API_URL.format(base=self.base), timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("result") != "success" or not data.get("rates"):
+            raise ValueError(f"unexpected response: {data.get('error-type') or data.get('result')}")
+        return {"base": self.base, "fetched_at": time.time(), "rates": data["rates"]}
+
+    def rates(self):
+        """
+        Returns (rates, note): rates for one unit of the base currency (or None when there
+        is no usable rate at all) and a note for the summary when they are not fresh.
+        """
+        if self._loaded is not None:
+            return self._loaded
+
+        cache = self._load_cache()
+        age = time.time() - cache["fetched_at"] if cache else None
+        if cache and (age < self.ttl or self.offline):
+            self._loaded = cache["rates"], None if age < self.ttl else self._stale_note(cache, "offline mode")
+            return self._loaded
+        if self.offline:
+            self._loaded = None, "No cached exchange rates (offline mode)."
+            return self._loaded
+
+        try:
+            cache = self._fetch()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Failed to fetch exchange rates: {e}")
+            reason = type(e).__name__ if isinstance(e, requests.RequestException) else str(e)
+            if cache and age < self.max_stale:
+                self._loaded = cache["rates"], self._stale_note(cache, f"live rate unavailable: {reason}")
+            else:
+                self._loaded = None, f"Exchange rates unavailable ({reason})."
+            return self._loaded
+
+        try:
+            self._save_cache(cache)
+        except OSError as e:
+            print(f"Failed to save exchange rate cache {self.cache_path}: {e}")
+        self._loaded = cache["rates"], None
+        return self._loaded
+
+    def rate(self, currency):
+        """
+        Returns (rate, note) for converting the base currency to `currency`.
+        """
+        rates, note = self.rates()
+        if rates is None:
+            return None, note
+        rate = rates.get(currency.upper())
+        if rate is None:
+            return None, f"No exchange rate for {currency.upper()}."
+        return rate, note
+
+    def _stale_note(self, cache, reason):
+        fetched = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(cache["fetched_at"]))
+        return f"Exchange rates from {fetched} ({reason})."
@@ -1,11 +1,19 @@
+import argparse
 import json
 import sys
 
+from balance_store import BalanceStore, DEFAULT_DB_PATH
+
+parser = argparse.ArgumentParser(description="Saves `doctl balance get -o json` output from stdin for one account.")
+parser.add_argument("account_name", help="Account name.")
+parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Balance history database. Default is {DEFAULT_DB_PATH}.")
+args = parser.parse_args()
+
 # JSON from stdin
 data = json.load(sys.stdin)
 
 # Account name from command line
-account_name = sys.argv[1]
+account_name = args.account_name
 data["account_name"] = account_name
 
 # Create filename
@@ -16,3 +24,11 @@ with open(file_name, 'w') as f:
     json.dump(data, f, indent=4, ensure_ascii=False)
 
 print(f"Data are save to file: {file_name}.")
+
+# Append the snapshot to the history, which the summary uses for trends
+store = BalanceStore(args.db)
+if store.add(account_name, data):
+    print(f"Snapshot added to {args.db}.")
+else:
+    print(f"Snapshot already in {args.db}.")
+store.close()
@@ -2,20 +2,37 @@ import json
 import os
 import requests
 import argparse
+import time
 
-EXCHANGE_API_URL = "https://open.er-api.com/v6/latest/USD"
+from balance_store import BalanceStore, DEFAULT_DB_PATH
+from exchange_rates import ExchangeRateProvider, DEFAULT_CACHE_PATH, DEFAULT_TTL_HOURS, DEFAULT_MAX_STALE_DAYS
 
-def get_usd_to_pln_rate():
+def format_trends(trends):
     """
-    Fetch the current exchange rate for USD to PLN.
+    Formats balance history trends (BalanceStore.trends) as lines of the summary.
     """
-    response = requests.get(EXCHANGE_API_URL)
-    if response.status_code == 200:
-        data = response.json()
-        return data["rates"]["PLN"]
-    else:
-        print(f"Failed to fetch exchange rate. Error: {response.status_code} - {response.text}")
-        return None
+    totals = trends["totals"]
+    if not totals:
+        return []
+    lines = ["** ---===### TRENDS ###===--- **"]
+    burn_line = f"🔥 Burn Rate (USD/day): {totals['burn_per_day']:.2f}"
+    if totals["last_month_burn_per_day"] is not None:
+        burn_line += f" (last month {totals['last_month_burn_per_day']:.2f}"
+        burn_line += f", {totals['burn_change']:+.1%})" if totals["burn_change"] is not None else ")"
+    lines.append(burn_line)
+    projected_line = f"🔮 Projected End of Month Usage (USD): {totals['projected']:.2f}"
+    if totals["last_month_total"] is not None and totals["last_month_complete"]:
+        projected_line += f" (last month {totals['last_month_total']:.2f})"
+    elif totals["last_month_total"] is not None:
+        # No snapshot from the end of last month - only the usage up to the last one is known
+        until = time.strftime("%Y-%m-%d", time.gmtime(totals["last_month_until"]))
+        projected_line += f" (last month {totals['last_month_total']:.2f} by {until})"
+    lines.append(projected_line)
+    for account, trend in sorted(trends["accounts"].items()):
+        since = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(trend["previous_at"])) if trend["previous_at"] else "first snapshot"
+        lines.append(f"{account}: {trend['delta']:+.2f} USD since {since}, "
+                     f"{trend['burn_per_day']:.2f} USD/day, projected {trend['projected']:.2f} USD")
+    return lines
 
 def send_to_discord(webhook_url, message):
     """
@@ -43,6 +60,12 @@ def main():
     parser = argparse.ArgumentParser(description="Summarizes JSON files and sends results to Discord or saves to a file.")
     parser.add_argument("--webhook", help="Discord webhook URL.")
     parser.add_argument("--path", default="./", help="Path to the directory with JSON files. Default is the current directory.")
+    parser.add_argument("--currency", default="PLN", help="Comma-separated currencies to convert the USD totals to. Default is PLN.")
+    parser.add_argument("--rates-cache", default=DEFAULT_CACHE_PATH, help=f"Exchange rate cache file. Default is {DEFAULT_CACHE_PATH}.")
+    parser.add_argument("--rates-ttl", type=float, default=DEFAULT_TTL_HOURS, help=f"Hours before cached rates are refreshed. Default is {DEFAULT_TTL_HOURS}.")
+    parser.add_argument("--max-stale", type=float, default=DEFAULT_MAX_STALE_DAYS, help=f"Days an outdated cached rate may still be used when the refresh fails. Default is {DEFAULT_MAX_STALE_DAYS}.")
+    parser.add_argument("--offline", action="store_true", help="Never fetch rates, use the cached ones whatever their age.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Balance history database used for trends. Default is {DEFAULT_DB_PATH}.")
     
     args = parser.parse_args()
     
@@ -51,6 +74,8 @@ def main():
     total_account_balance = 0.0
     total_month_to_date_usage = 0.0
     account_summaries = []
+    account_names = []
+    store = BalanceStore(args.db)
 
     # List of JSON files in the specified directory
     files = [os.path.join(args.path, f) for f in os.listdir(args.path) if os.path.isfile(os.path.join(args.path, f)) and f.endswith('.json')]
@@ -62,28 +87,40 @@ def main():
             account_name = os.path.basename(file_name).replace(".json", "")
             account_summary = f"{account_name}: {data['month_to_date_balance']} USD"
             account_summaries.append(account_summary)
+            account_names.append(account_name)
+
+            # Snapshots saved by older versions of get-customer-balance.py are added to the history here
+            store.add(account_name, data, taken_at=None if data.get("generated_at") else os.path.getmtime(file_name))
             
             total_month_to_date_balance += float(data['month_to_date_balance'])
             total_account_balance += float(data['account_balance'])
             total_month_to_date_usage += float(data['month_to_date_usage'])
 
-    usd_to_pln_rate = get_usd_to_pln_rate()
-    if not usd_to_pln_rate:
-        print("Failed to retrieve exchange rate. Exiting.")
-        return
+    # Convert the total with cached rates; without a usable rate the summary is sent without the conversion
+    provider = ExchangeRateProvider("USD", args.rates_cache, args.rates_ttl * 3600, args.max_stale * 86400, offline=args.offline)
+    converted_lines, notes = [], []
+    for currency in (c.strip().upper() for c in args.currency.split(",") if c.strip()):
+        rate, note = provider.rate(currency)
+        if note and note not in notes:
+            notes.append(note)
+        if rate:
+            converted_lines.append(f"💰 Total Month to Date Balance ({currency}): {total_month_to_date_balance * rate:.2f}")
+    converted_balances = "".join(f"\n{line}" for line in converted_lines)
+    rate_notes = "".join(f"\n⚠️ {note}" for note in notes)
 
-    total_month_to_date_balance_pln = total_month_to_date_balance * usd_to_pln_rate
+    trend_lines = format_trends(store.trends(account_names))
+    store.close()
+    trend_message = "".join(f"\n{line}" for line in trend_lines)
 
     # Create the summary message with individual account balances
     account_balance_message = "\n".join(account_summaries)
     message = f"""
 📊 ** ---===### SUMMARY ###===--- **
-📈 Total Month to Date Balance (USD): {total_month_to_date_balance:.2f}
-💰 Total Month to Date Balance (PLN): {total_month_to_date_balance_pln:.2f}
+📈 Total Month to Date Balance (USD): {total_month_to_date_balance:.2f}{converted_balances}
 🔒 Total Account Balance (USD): {total_account_balance:.2f}
 📈 Total Month to Date Usage (USD): {total_month_to_date_usage:.2f}
 ** ---===### PER ACCOUNT ###===--- **
-{account_balance_message}
+{account_balance_message}{trend_message}{rate_notes}
 
 
 """
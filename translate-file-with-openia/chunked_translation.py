@@ -0,0 +1,144 @@
+"""
+Chunked translation of large text files.
+
+The source file is read paragraph by paragraph and grouped into chunks that
+fit a token budget; a paragraph that is too long on its own is split on
+sentence boundaries (and, as a last resort, on whitespace). Chunks are
+translated concurrently by a bounded thread pool and appended in source order
+to a temporary file next to the output as soon as each one and all chunks
+before it are done, so memory use stays flat as files grow. The temporary
+file replaces the output only once every chunk is translated.
+"""
+
+import os
+import re
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_CHUNK_TOKENS = 1500
+DEFAULT_WORKERS = 4
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…;:])\s+")
+PARAGRAPH_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text):
+    """Rough token count (about 3 characters per token for multilingual text)."""
+    return len(text) // 3 + 1
+
+
+def iter_paragraphs(file):
+    """Yield paragraphs (runs of non-blank lines) from an open text file without reading it whole."""
+    lines = []
+    for line in file:
+        if line.strip():
+            lines.append(line.rstrip("\n"))
+        elif lines:
+            yield "\n".join(lines)
+            lines = []
+    if lines:
+        yield "\n".join(lines)
+
+
+def _split_long(text, max_tokens):
+    """Split a paragraph that exceeds the budget on sentence boundaries, then on whitespace."""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END_RE.split(text):
+        if estimate_tokens(sentence) > max_tokens:
+            words = sentence.split(" ")
+            sentence_parts, part = [], ""
+            for word in words:
+                if part and estimate_tokens(part + " " + word) > max_tokens:
+                    sentence_parts.append(part)
+                    part = word
+                else:
+                    part = f"{part} {word}" if part else word
+            sentence_parts.append(part)
+        else:
+            sentence_parts = [sentence]
+
+        for part in sentence_parts:
+            if current and estimate_tokens(current + " " + part) > max_tokens:
+                pieces.append(current)
+                current = part
+            else:
+                current = f"{current} {part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def iter_chunks(paragraphs, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Group paragraphs into chunks of at most `max_tokens` (estimated), keeping paragraph breaks."""
+    current, current_tokens = [], 0
+    for paragraph in paragraphs:
+        pieces = [paragraph] if estimate_tokens(paragraph) <= max_tokens else _split_long(paragraph, max_tokens)
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                yield PARAGRAPH_SEPARATOR.join(current)
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        yield PARAGRAPH_SEPARATOR.join(current)
+
+
+def translate_stream(source_file_path, output_file_path, translate, chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                     workers=DEFAULT_WORKERS):
+    """
+    Translate `source_file_path` into `output_file_path` chunk by chunk; the
+    output only appears (or is replaced) once every chunk is translated.
+    `translate(text)` translates one chunk; at most `workers` chunks are in
+    flight and at most twice that many are held in memory. Returns a dict with
+    the number of chunks and estimated source tokens.
+    """
+    stats = {"chunks": 0, "tokens": 0}
+    # Written to a temporary file next to the output and moved into place at the end, so the
+    # source may be the output itself and a failed run does not leave a half-written file
+    temp_path = output_file_path + ".tmp"
+    try:
+        with open(source_file_path, "r", encoding="utf-8") as source, \
+                open(temp_path, "w", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            chunks = enumerate(iter_chunks(iter_paragraphs(source), chunk_tokens))
+            running, finished = {}, {}
+            next_to_write = 0
+            exhausted = False
+
+            while running or not exhausted:
+                # Keep the pool busy, but never read far ahead of what has been written
+                while not exhausted and len(running) + len(finished) < 2 * max(1, workers):
+                    try:
+                        number, chunk = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    stats["tokens"] += estimate_tokens(chunk)
+                    running[executor.submit(translate, chunk)] = number
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    number = running.pop(future)
+                    try:
+                        finished[number] = future.result()
+                    except Exception:
+                        for pending in running:
+                            pending.cancel()
+                        raise
+
+                while next_to_write in finished:
+                    if next_to_write:
+                        output.write(PARAGRAPH_SEPARATOR)
+                    output.write(finished.pop(next_to_write).strip())
+                    output.flush()
+                    next_to_write += 1
+                    print(f"Chunk {next_to_write} written to {temp_path}", flush=True)
+
+            output.write("\n")
+            stats["chunks"] = next_to_write
+        os.replace(temp_path, output_file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return stats
@@ -0,0 +1,164 @@
+"""
+Offline submission of many chat completion requests through the OpenAI Batch API.
+
+Requests are collected under caller-chosen custom ids, written as JSONL,
+uploaded with `files.create(purpose="batch")` and submitted with
+`batches.create`. The batch is then polled until it reaches a final status
+and the output (and error) files are downloaded and mapped back to the
+custom ids. Batch requests are billed at a discount and do not count against
+the synchronous rate limits, at the cost of completing within the
+completion window (up to 24 hours) instead of immediately.
+
+Submissions larger than the API limits are split into several batches. When
+a `state_path` is given the submitted batch ids are saved there, so a run
+that is interrupted while waiting resumes polling the same batches instead
+of submitting (and paying for) them again.
+
+NOTE: yt-dlp/openai_batch.py is the same module with Polish messages, so both
+folders stay self-contained; apply behaviour changes to both files.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_POLL_SECONDS = 60
+CHAT_ENDPOINT = "/v1/chat/completions"
+
+# API limits for one batch input file, with some headroom on the size
+MAX_BATCH_REQUESTS = 50000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchError(Exception):
+    """A request of a batch that did not produce a result."""
+
+
+def message_text(body):
+    """The reply text of a chat completion response body from a batch output file."""
+    return body["choices"][0]["message"]["content"]
+
+
+class BatchSubmission:
+    def __init__(self, client, endpoint=CHAT_ENDPOINT, completion_window="24h"):
+        self.client = client
+        self.endpoint = endpoint
+        self.completion_window = completion_window
+        self.requests = []
+
+    def __len__(self):
+        return len(self.requests)
+
+    def add(self, custom_id, **body):
+        """Add one request; `body` is what would be passed to the synchronous call (model, messages...)."""
+        self.requests.append((str(custom_id), body))
+
+    def _input_files(self):
+        """JSONL contents of the batch input files, split to stay under the API limits."""
+        lines, size = [], 0
+        for custom_id, body in self.requests:
+            line = json.dumps({"custom_id": custom_id, "method": "POST", "url": self.endpoint, "body": body},
+                              ensure_ascii=False).encode("utf-8") + b"\n"
+            if lines and (len(lines) >= MAX_BATCH_REQUESTS or size + len(line) > MAX_BATCH_BYTES):
+                yield b"".join(lines)
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line)
+        if lines:
+            yield b"".join(lines)
+
+    def _fingerprint(self):
+        digest = hashlib.sha256(self.endpoint.encode("utf-8"))
+        for custom_id, body in self.requests:
+            digest.update(json.dumps([custom_id, body], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
+    def submit(self):
+        """Upload the requests and create the batches. Returns the batch ids."""
+        batch_ids = []
+        for number, data in enumerate(self._input_files(), 1):
+            input_file = self.client.files.create(file=(f"batch-{number}.jsonl", data), purpose="batch")
+            batch = self.client.batches.create(input_file_id=input_file.id, endpoint=self.endpoint,
+                                               completion_window=self.completion_window)
+            requests = data.count(b"\n")
+            print(f"Submitted batch {batch.id} ({requests} requests)", flush=True)
+            batch_ids.append(batch.id)
+        return batch_ids
+
+    def wait(self, batch_ids, poll_seconds=DEFAULT_POLL_SECONDS, timeout=None):
+        """Poll until every batch reaches a final status. Returns the batch objects."""
+        started = time.monotonic()
+        done, last_status = {}, {}
+        while len(done) < len(batch_ids):
+            for batch_id in batch_ids:
+                if batch_id in done:
+                    continue
+                batch = self.client.batches.retrieve(batch_id)
+                counts = batch.request_counts
+                status = f"{batch.status} ({counts.completed + counts.failed}/{counts.total})" if counts else batch.status
+                if last_status.get(batch_id) != status:
+                    print(f"Batch {batch_id}: {status}", flush=True)
+                    last_status[batch_id] = status
+                if batch.status in FINAL_STATUSES:
+                    done[batch_id] = batch
+            if len(done) < len(batch_ids):
+                if timeout is not None and time.monotonic() - started > timeout:
+                    raise TimeoutError(f"Batches still running after {timeout:.0f} s: "
+                                       f"{', '.join(b for b in batch_ids if b not in done)}")
+                time.sleep(poll_seconds)
+        return [done[batch_id] for batch_id in batch_ids]
+
+    def _read_file(self, file_id):
+        for line in self.client.files.content(file_id).text.splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+    def results(self, batches):
+        """Map every custom id to its response body, or to a BatchError when it has no usable result."""
+        results = {}
+        for batch in batches:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                for entry in self._read_file(file_id):
+                    response = entry.get("response") or {}
+                    body = response.get("body") or {}
+                    if entry.get("error") or response.get("status_code") != 200:
+                        error = entry.get("error") or body.get("error") or {}
+                        results[entry["custom_id"]] = BatchError(
+                            f"{error.get('message') or 'request failed'} (status {response.get('status_code')})")
+                    else:
+                        results[entry["custom_id"]] = body
+
+        statuses = ", ".join(sorted({batch.status for batch in batches}))
+        for custom_id, _ in self.requests:
+            results.setdefault(custom_id, BatchError(f"no result in the batch output (batch {statuses})"))
+        return results
+
+    def run(self, poll_seconds=DEFAULT_POLL_SECONDS, timeout=None, state_path=None):
+        """Submit (or resume from `state_path`), wait and return {custom_id: body or BatchError}."""
+        if not self.requests:
+            return {}
+        fingerprint = self._fingerprint()
+        batch_ids = None
+        if state_path and os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("fingerprint") == fingerprint:
+                batch_ids = state["batch_ids"]
+                print(f"Resuming batches from {state_path}: {', '.join(batch_ids)}", flush=True)
+
+        if batch_ids is None:
+            batch_ids = self.submit()
+            if state_path:
+                with open(state_path, "w", encoding="utf-8") as f:
+                    json.dump({"fingerprint": fingerprint, "batch_ids": batch_ids,
+                               "submitted_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+
+        results = self.results(self.wait(batch_ids, poll_seconds, timeout))
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        return results
@@ -1,38 +1,305 @@
 from openai import OpenAI
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
 import sys
+import time
 
-def translate_file(api_key, source_file_path, output_file_path, model="gpt-3.5-turbo", source_language="auto", target_language="English"):
-    client = OpenAI(api_key=api_key)
-    # Load the content of the source file
-    with open(source_file_path, 'r', encoding='utf-8') as file:
-        file_content = file.read()
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from translation_cache import TranslationCache, DEFAULT_CACHE_PATH
+from chunked_translation import (translate_stream, iter_chunks, iter_paragraphs, estimate_tokens,
+                                 PARAGRAPH_SEPARATOR, DEFAULT_CHUNK_TOKENS, DEFAULT_WORKERS)
+from openai_batch import BatchSubmission, message_text, DEFAULT_POLL_SECONDS
+
+# Bump when the prompt changes so cached translations are not reused
+PROMPT_VERSION = "file-2"
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Sidecar written next to every output file of a batch run: <output><MANIFEST_SUFFIX>
+MANIFEST_SUFFIX = ".translation.json"
+
+# Batch API ids of a submission that is still running, so an interrupted run resumes it
+DEFAULT_BATCH_STATE = "batch_state.json"
+
+def translation_messages(text, source_language, target_language):
     # Prepare the structured input for translation
-    messages = [
-        {"role": "system", "content": f"Translate the following text from {source_language} to {target_language}."},
-        {"role": "user", "content": file_content}
+    return [
+        {"role": "system", "content": f"Translate the following text from {source_language} to {target_language}. "
+                                      "Keep the paragraph breaks and reply with the translation only."},
+        {"role": "user", "content": text}
     ]
 
-    # Send the request to OpenAI
-    response = client.chat.completions.create(model=model, messages=messages)
+def chunk_translator(client, model, source_language, target_language, cache=None):
+    """Return a function translating one chunk of text, with results cached per chunk when `cache` is given."""
+    def translate_chunk(text):
+        messages = translation_messages(text, source_language, target_language)
 
-    # Extract the translated text
-    translated_text = response.choices[0].message.content.strip()
+        def translate():
+            # Send the request to OpenAI
+            response = client.chat.completions.create(model=model, messages=messages)
 
+            # Extract the translated text
+            return response.choices[0].message.content.strip()
 
-    # Save the translated text to the output file
-    with open(output_file_path, 'w', encoding='utf-8') as output_file:
-        output_file.write(translated_text)
+        # Reuse a cached translation of the same chunk, language and model if there is one
+        if cache is None:
+            return translate()
+        return cache.get_or_translate(text, f"{source_language}->{target_language}", model, PROMPT_VERSION, translate)
 
-    print(f"Translated text saved to {output_file_path}")
+    return translate_chunk
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python script.py <API_KEY> <SOURCE_FILE_PATH> <OUTPUT_FILE_PATH>")
-        sys.exit(1)
+def translate_file(api_key, source_file_path, output_file_path, model=DEFAULT_MODEL, source_language="auto", target_language="English", cache_path=DEFAULT_CACHE_PATH, chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=DEFAULT_WORKERS, base_url=None, batch_api=False, poll_seconds=DEFAULT_POLL_SECONDS, batch_state=DEFAULT_BATCH_STATE):
+    client = OpenAI(api_key=api_key, base_url=base_url)
+    cache = TranslationCache(cache_path) if cache_path else None
+
+    try:
+        if batch_api:
+            result = translate_files_batch(client, [(source_file_path, output_file_path)], model, source_language,
+                                           target_language, cache, chunk_tokens, poll_seconds, batch_state)
+            stats = result[source_file_path]
+            if isinstance(stats, Exception):
+                raise stats
+        else:
+            # The file is split into chunks that are translated in parallel and written in order to a temporary file
+            translate_chunk = chunk_translator(client, model, source_language, target_language, cache)
+            stats = translate_stream(source_file_path, output_file_path, translate_chunk, chunk_tokens, workers)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    print(f"Translated text saved to {output_file_path} ({stats['chunks']} chunks, ~{stats['tokens']} source tokens)")
+    return stats
+
+def translate_files_batch(client, files, model, source_language, target_language, cache=None, chunk_tokens=DEFAULT_CHUNK_TOKENS, poll_seconds=DEFAULT_POLL_SECONDS, batch_state=None):
+    """
+    Translate the (source, output) pairs in `files` with one Batch API submission.
+    Chunks already in `cache` are not sent. Every output whose chunks all came back
+    is written whole; returns {source: stats dict, or the exception that failed it}.
+    """
+    language_pair = f"{source_language}->{target_language}"
+    submission = BatchSubmission(client)
+    plans = []
+    for file_number, (source_file_path, output_file_path) in enumerate(files):
+        with open(source_file_path, "r", encoding="utf-8") as f:
+            chunks = list(iter_chunks(iter_paragraphs(f), chunk_tokens))
+        translated = [None] * len(chunks)
+        for chunk_number, chunk in enumerate(chunks):
+            if cache is not None:
+                translated[chunk_number] = cache.get(cache.make_key(chunk, language_pair, model, PROMPT_VERSION))
+            if translated[chunk_number] is None:
+                submission.add(f"{file_number}:{chunk_number}", model=model,
+                               messages=translation_messages(chunk, source_language, target_language))
+        plans.append((source_file_path, output_file_path, chunks, translated))
+
+    print(f"Sending {len(submission)} chunks of {len(files)} files to the Batch API", flush=True)
+    responses = submission.run(poll_seconds, state_path=batch_state)
+
+    results = {}
+    for file_number, (source_file_path, output_file_path, chunks, translated) in enumerate(plans):
+        errors = []
+        for chunk_number, chunk in enumerate(chunks):
+            response = responses.get(f"{file_number}:{chunk_number}")
+            if response is None:
+                continue
+            if isinstance(response, Exception):
+                errors.append(f"chunk {chunk_number + 1}: {response}")
+                continue
+            translated[chunk_number] = message_text(response).strip()
+            if cache is not None:
+                cache.set(cache.make_key(chunk, language_pair, model, PROMPT_VERSION), translated[chunk_number])
+        if errors:
+            results[source_file_path] = RuntimeError(f"{len(errors)} of {len(chunks)} chunks failed ({errors[0]})")
+            continue
+
+        temp_path = output_file_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(PARAGRAPH_SEPARATOR.join(text.strip() for text in translated) + "\n")
+        os.replace(temp_path, output_file_path)
+        results[source_file_path] = {"chunks": len(chunks), "tokens": sum(estimate_tokens(chunk) for chunk in chunks)}
+    return results
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def manifest_entry(source_hash, model, source_language, target_language):
+    """What an output was produced from; an output is up to date when its sidecar holds the same entry."""
+    return {
+        "source_sha256": source_hash,
+        "model": model,
+        "source_language": source_language,
+        "target_language": target_language,
+        "prompt_version": PROMPT_VERSION,
+    }
 
-    api_key = sys.argv[1]
-    source_file_path = sys.argv[2]
-    output_file_path = sys.argv[3]
+def is_up_to_date(output_file_path, entry):
+    manifest_path = output_file_path + MANIFEST_SUFFIX
+    if not os.path.exists(output_file_path) or not os.path.exists(manifest_path):
+        return False
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return all(saved.get(key) == value for key, value in entry.items())
 
-    translate_file(api_key, source_file_path, output_file_path)
+def write_manifest(output_file_path, source_file_path, entry):
+    manifest_path = output_file_path + MANIFEST_SUFFIX
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(entry, source=source_file_path, translated_at=time.strftime("%Y-%m-%dT%H:%M:%S")),
+                  f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, manifest_path)
+
+def find_source_files(source_dir, output_dir, patterns, recursive=True):
+    """Files under `source_dir` matching any of `patterns` (the output tree is skipped if it is nested inside)."""
+    output_dir = os.path.abspath(output_dir)
+    found = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir)
+        for name in sorted(files):
+            if name.endswith(MANIFEST_SUFFIX) or not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                continue
+            found.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return found
+
+def translate_tree(api_key, source_dir, output_dir, model=DEFAULT_MODEL, source_language="auto", target_language="English", cache_path=DEFAULT_CACHE_PATH, chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=DEFAULT_WORKERS, patterns=("*.txt",), recursive=True, files=2, force=False, base_url=None, batch_api=False, poll_seconds=DEFAULT_POLL_SECONDS, batch_state=DEFAULT_BATCH_STATE):
+    """
+    Translate every matching file under `source_dir` into the same relative path under `output_dir`.
+    Up to `files` files are translated at once, sharing one client and cache. Outputs whose sidecar
+    manifest matches the source hash, model, languages and prompt version are skipped unless `force`.
+    With `batch_api` all outdated files are sent as one Batch API submission instead.
+    """
+    # Outputs would overwrite their sources and the next run would translate the translations
+    if os.path.abspath(output_dir) == os.path.abspath(source_dir):
+        raise ValueError("The output directory must differ from the source directory.")
+
+    client = OpenAI(api_key=api_key, base_url=base_url)
+    cache = TranslationCache(cache_path) if cache_path else None
+    translate_chunk = chunk_translator(client, model, source_language, target_language, cache)
+    sources = find_source_files(source_dir, output_dir, patterns, recursive)
+
+    def plan(source_file_path):
+        output_file_path = os.path.join(output_dir, os.path.relpath(source_file_path, source_dir))
+        entry = manifest_entry(file_sha256(source_file_path), model, source_language, target_language)
+        if not force and is_up_to_date(output_file_path, entry):
+            return output_file_path, None
+        os.makedirs(os.path.dirname(output_file_path) or ".", exist_ok=True)
+        return output_file_path, entry
+
+    def translate_one(source_file_path):
+        output_file_path, entry = plan(source_file_path)
+        if entry is None:
+            return "skipped", 0
+        stats = translate_stream(source_file_path, output_file_path, translate_chunk, chunk_tokens, workers)
+        write_manifest(output_file_path, source_file_path, entry)
+        return "translated", stats["tokens"]
+
+    started = time.monotonic()
+    counts = {"translated": 0, "skipped": 0, "failed": 0}
+    tokens = 0
+
+    def count(source_file_path, status, file_tokens=0, error=None):
+        nonlocal tokens
+        counts[status] += 1
+        tokens += file_tokens
+        if status == "failed":
+            print(f"Failed to translate {source_file_path}: {error}")
+        elif status == "skipped":
+            print(f"Up to date, skipped: {source_file_path}")
+
+    try:
+        if batch_api:
+            planned = {}
+            for source_file_path in sources:
+                output_file_path, entry = plan(source_file_path)
+                if entry is None:
+                    count(source_file_path, "skipped")
+                else:
+                    planned[source_file_path] = (output_file_path, entry)
+            results = translate_files_batch(client, [(source, output) for source, (output, _) in planned.items()],
+                                            model, source_language, target_language, cache, chunk_tokens,
+                                            poll_seconds, batch_state) if planned else {}
+            for source_file_path, result in results.items():
+                if isinstance(result, Exception):
+                    count(source_file_path, "failed", error=result)
+                    continue
+                output_file_path, entry = planned[source_file_path]
+                write_manifest(output_file_path, source_file_path, entry)
+                count(source_file_path, "translated", result["tokens"])
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, files)) as executor:
+                futures = {executor.submit(translate_one, path): path for path in sources}
+                for future in as_completed(futures):
+                    try:
+                        status, file_tokens = future.result()
+                    except Exception as e:
+                        count(futures[future], "failed", error=e)
+                        continue
+                    count(futures[future], status, file_tokens)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    elapsed = max(time.monotonic() - started, 1e-9)
+    print(f"Translated {counts['translated']}, skipped {counts['skipped']}, failed {counts['failed']} "
+          f"of {len(sources)} files in {elapsed:.1f} s: {counts['translated'] / elapsed:.2f} files/s, "
+          f"{tokens / elapsed:.0f} source tokens/s")
+    return counts
+
+def main(default_model=DEFAULT_MODEL):
+    parser = argparse.ArgumentParser(description="Translate a file, or a directory of files, with the OpenAI API.")
+    parser.add_argument("api_key", help="OpenAI API key.")
+    parser.add_argument("source", help="Source file, or source directory for batch mode.")
+    parser.add_argument("output", help="Output file, or output directory for batch mode.")
+    parser.add_argument("--model", default=default_model, help=f"Model to use (default {default_model}).")
+    parser.add_argument("--source-language", default="auto", help="Source language (default auto).")
+    parser.add_argument("--target-language", default="English", help="Target language (default English).")
+    parser.add_argument("--recursive", action="store_true", help="Batch mode: include subdirectories.")
+    parser.add_argument("--pattern", default="*.txt",
+                        help="Batch mode: comma-separated file name patterns to translate (default *.txt).")
+    parser.add_argument("--files", type=int, default=2, help="Batch mode: files translated at once (default 2).")
+    parser.add_argument("--force", action="store_true", help="Batch mode: translate even up-to-date outputs.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Chunks translated at once per file (default {DEFAULT_WORKERS}).")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help=f"Approximate token budget of one chunk (default {DEFAULT_CHUNK_TOKENS}).")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help=f"Translation cache file (default {DEFAULT_CACHE_PATH}).")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the translation cache.")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Send all chunks as one OpenAI Batch API job (cheaper, finishes within 24 hours) "
+                             "and wait for it.")
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS,
+                        help=f"Batch API: seconds between status checks (default {DEFAULT_POLL_SECONDS}).")
+    parser.add_argument("--batch-state", default=DEFAULT_BATCH_STATE,
+                        help=f"Batch API: file keeping the ids of a running submission so an interrupted run "
+                             f"resumes it (default {DEFAULT_BATCH_STATE}).")
+    parser.add_argument("--base-url", default=None, help="Alternative OpenAI API URL (e.g. a local test server).")
+    args = parser.parse_args()
+
+    cache_path = None if args.no_cache else args.cache
+    if os.path.isdir(args.source):
+        if os.path.abspath(args.output) == os.path.abspath(args.source):
+            parser.error("the output directory must differ from the source directory")
+        counts = translate_tree(args.api_key, args.source, args.output, args.model, args.source_language,
+                                args.target_language, cache_path, args.chunk_tokens, args.workers,
+                                [pattern.strip() for pattern in args.pattern.split(",") if pattern.strip()],
+                                args.recursive, args.files, args.force, args.base_url, args.batch_api,
+                                args.poll_seconds, args.batch_state)
+        sys.exit(1 if counts["failed"] else 0)
+
+    translate_file(args.api_key, args.source, args.output, args.model, args.source_language,
+                   args.target_language, cache_path, args.chunk_tokens, args.workers, args.base_url,
+                   args.batch_api, args.poll_seconds, args.batch_state)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Persistent, content-addressed cache for translations.
+
+Entries are keyed by a SHA-256 hash of (source text, target language, model,
+prompt version) and stored in SQLite, so several threads or processes can share
+one cache file. The cache is bounded: once it holds more than `max_entries`
+rows the least recently used ones are evicted.
+
+NOTE: yt-dlp/translation_cache.py is the same module with Polish docstrings, so
+both folders stay self-contained; apply behaviour changes to both files.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = "translation_cache.sqlite"
+
+
+class TranslationCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(source_text, target_lang, model, prompt_version):
+        digest = hashlib.sha256()
+        for part in (prompt_version, model, target_lang, source_text):
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, value, last_used) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN ("
+                " SELECT key FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def get_or_translate(self, source_text, target_lang, model, prompt_version, translate):
+        """Return the cached translation or call `translate()` and store its result."""
+        key = self.make_key(source_text, target_lang, model, prompt_version)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = translate()
+        self.set(key, value)
+        return value
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,243 @@
+"""
+Przygotowanie audio dla Whisper (mono, 16 kHz, Opus, opcjonalne wycięcie ciszy
+z mapą czasu), dzielenie długich nagrań na fragmenty w miejscach ciszy
+i równoległa transkrypcja fragmentów. Wymaga ffmpeg i ffprobe w PATH.
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+from srt_tools import parse_srt, format_srt, shift_cues, renumber_cues, timestamp_to_ms, ms_to_timestamp
+from metrics import in_context, record
+
+# Limit rozmiaru pliku przyjmowanego przez endpoint transkrypcji OpenAI
+WHISPER_MAX_BYTES = 25 * 1024 * 1024
+
+SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end:\s*([\d.]+)")
+
+
+def probe_duration(path):
+    """Długość pliku audio w sekundach (ffprobe)."""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip())
+
+
+def detect_silences(path, noise_db=-35, min_silence=0.4):
+    """Lista przedziałów ciszy (start, koniec) w sekundach wykrytych filtrem silencedetect."""
+    stderr = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", path,
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"],
+        capture_output=True, text=True, check=True
+    ).stderr
+
+    silences = []
+    start = None
+    for line in stderr.splitlines():
+        match = SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def plan_segments(duration, silences, segment_seconds=600, overlap=2.0, search_window=60):
+    """
+    Wyznaczenie fragmentów nagrania. Każde cięcie wypada w środku ciszy
+    najbliższej docelowej długości fragmentu (w oknie `search_window` sekund),
+    a gdy takiej ciszy brak - dokładnie w punkcie docelowym.
+    Zwraca listę (początek, koniec, granica_początku, granica_końca) w sekundach:
+    początek/koniec zawierają zakładkę `overlap`, a granice wyznaczają część
+    fragmentu, z której napisy trafiają do wyniku.
+    """
+    cuts = [0.0]
+    while duration - cuts[-1] > segment_seconds:
+        target = cuts[-1] + segment_seconds
+        candidates = [
+            (start + end) / 2 for start, end in silences
+            if abs((start + end) / 2 - target) <= search_window and (start + end) / 2 > cuts[-1] + overlap
+        ]
+        cuts.append(min(candidates, key=lambda point: abs(point - target)) if candidates else target)
+    cuts.append(duration)
+
+    segments = []
+    for number in range(len(cuts) - 1):
+        boundary_start, boundary_end = cuts[number], cuts[number + 1]
+        segments.append((
+            max(0.0, boundary_start - overlap),
+            min(duration, boundary_end + overlap),
+            boundary_start,
+            boundary_end,
+        ))
+    return segments
+
+
+def cut_segment(path, start, end, output_path):
+    """Wycięcie fragmentu audio (mono, 16 kHz, mp3) do pliku `output_path`."""
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+         "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path,
+         "-vn", "-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "48k", output_path],
+        check=True
+    )
+    return output_path
+
+
+def _normalize_text(text):
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def merge_segment_transcripts(segment_cues):
+    """
+    Złożenie napisów z fragmentów w jeden plik.
+    `segment_cues` to lista (segment, napisy_w_czasie_oryginału) w kolejności nagrania.
+    Z każdego fragmentu brane są napisy zaczynające się w jego granicach,
+    a powtórzony na styku tekst z zakładki jest usuwany.
+    """
+    merged = []
+    for (_, _, boundary_start, boundary_end), cues in segment_cues:
+        for cue in cues:
+            start_ms = timestamp_to_ms(cue.start)
+            if start_ms < boundary_start * 1000 or start_ms >= boundary_end * 1000:
+                continue
+            if merged and _normalize_text(merged[-1].text) == _normalize_text(cue.text):
+                continue
+            merged.append(cue)
+    return renumber_cues(merged)
+
+
+def transcribe_file(audio_path, client):
+    """Transkrypcja jednego pliku audio do formatu SRT."""
+    record(bytes_out=os.path.getsize(audio_path))
+    with open(audio_path, "rb") as audio_file:
+        return client.audio.transcriptions.create(
+            model="whisper-1",
+            file=audio_file,
+            response_format="srt"
+        )
+
+
+def transcribe_segmented(audio_path, client, segment_seconds=600, overlap=2.0, jobs=4):
+    """
+    Transkrypcja długiego nagrania: podział w miejscach ciszy na zachodzące
+    na siebie fragmenty, równoległa transkrypcja i złożenie napisów
+    z poprawnym przesunięciem czasu. Zwraca treść SRT.
+    """
+    duration = probe_duration(audio_path)
+    segments = plan_segments(duration, detect_silences(audio_path), segment_seconds, overlap)
+    print(f"Transkrypcja w {len(segments)} fragmentach (ok. {segment_seconds} s każdy)...", flush=True)
+
+    with tempfile.TemporaryDirectory(prefix="whisper_segments_") as temp_dir:
+        def transcribe_segment(number):
+            start, end, _, _ = segments[number]
+            segment_path = cut_segment(audio_path, start, end, os.path.join(temp_dir, f"segment_{number:04d}.mp3"))
+            cues = shift_cues(parse_srt(transcribe_file(segment_path, client)), start * 1000)
+            print(f"Fragment {number + 1}/{len(segments)} przetranskrybowany.", flush=True)
+            return cues
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            segment_cues = list(executor.map(in_context(transcribe_segment), range(len(segments))))
+
+    return format_srt(merge_segment_transcripts(list(zip(segments, segment_cues))))
+
+
+def keep_intervals(duration, silences, keep_silence=0.3):
+    """
+    Przedziały nagrania (start, koniec) pozostałe po wycięciu ciszy.
+    Z każdej ciszy zostaje po `keep_silence` sekund na obu brzegach,
+    aby nie ucinać końcówek wypowiedzi.
+    """
+    intervals = []
+    position = 0.0
+    for start, end in silences:
+        cut_start, cut_end = start + keep_silence, end - keep_silence
+        if cut_end <= cut_start or cut_end <= position:
+            continue
+        if cut_start > position:
+            intervals.append((position, cut_start))
+        position = cut_end
+    if position < duration:
+        intervals.append((position, duration))
+    return intervals
+
+
+def build_time_map(intervals):
+    """Mapa czasu: lista (początek_po_obróbce, początek_w_oryginale, długość) w sekundach."""
+    time_map = []
+    processed = 0.0
+    for start, end in intervals:
+        time_map.append((processed, start, end - start))
+        processed += end - start
+    return time_map
+
+
+def map_to_original(seconds, time_map, is_end=False):
+    """
+    Przeliczenie czasu z nagrania po wycięciu ciszy na czas w oryginale.
+    Koniec napisu (`is_end`) leżący dokładnie na cięciu zostaje przed wyciętą ciszą.
+    """
+    if not time_map:
+        return seconds
+    for processed_start, original_start, length in time_map:
+        if seconds < processed_start + length or (is_end and seconds <= processed_start + length):
+            return original_start + max(0.0, seconds - processed_start)
+    processed_start, original_start, length = time_map[-1]
+    return original_start + seconds - processed_start
+
+
+def remap_cues(cues, time_map):
+    """Przesunięcie napisów z osi czasu nagrania po obróbce z powrotem na oś oryginału."""
+    return [
+        cue._replace(
+            start=ms_to_timestamp(map_to_original(timestamp_to_ms(cue.start) / 1000, time_map) * 1000),
+            end=ms_to_timestamp(map_to_original(timestamp_to_ms(cue.end) / 1000, time_map, is_end=True) * 1000),
+        )
+        for cue in cues
+    ]
+
+
+def preprocess_audio(path, output_path, cut_silence=None, bitrate="24k"):
+    """
+    Przygotowanie nagrania dla Whisper: mono, 16 kHz, Opus o niskiej przepływności.
+    Jeśli podano `cut_silence`, wycinane są fragmenty ciszy dłuższe niż tyle sekund.
+    Zwraca (ścieżka_wyniku, mapa_czasu) - mapę należy przekazać do remap_cues,
+    aby napisy wróciły na oś czasu oryginału (pusta mapa oznacza brak zmian czasu).
+    """
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", path, "-vn"]
+    time_map = []
+    if cut_silence:
+        intervals = keep_intervals(probe_duration(path), detect_silences(path, min_silence=cut_silence))
+        time_map = build_time_map(intervals)
+        selection = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in intervals)
+        command += ["-af", f"aselect='{selection}',asetpts=N/SR/TB"]
+    command += ["-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", bitrate, "-application", "voip",
+                output_path]
+    subprocess.run(command, check=True)
+
+    original_size, processed_size = os.path.getsize(path), os.path.getsize(output_path)
+    print(f"Audio przygotowane do transkrypcji: {original_size / 1e6:.1f} MB -> {processed_size / 1e6:.1f} MB"
+          + (f", wycięto {probe_duration(path) - sum(length for _, _, length in time_map):.0f} s ciszy"
+             if time_map else "") + ".", flush=True)
+    return output_path, time_map
+
+
+def needs_segmenting(audio_path, segment_seconds):
+    """Czy nagranie jest za duże lub za długie na jedno zapytanie do Whisper."""
+    if os.path.getsize(audio_path) > WHISPER_MAX_BYTES:
+        return True
+    try:
+        return probe_duration(audio_path) > segment_seconds * 1.5
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return False
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Benchmark potoku napisów bez sieci: uruchamia lokalne atrapy OpenAI i YouTube
+(fake_servers.py), a następnie dla każdego scenariusza cały potok filmu -
+run_stages(build_stages(...)) z --upload, tak jak yt_caption_uploader.py:
+transkrypcję, tłumaczenie SRT, lokalizację tytułu i opisu, eksport oraz
+publikację napisów (z usunięciem zduplikowanych ścieżek zapytaniem wsadowym)
+i lokalizacji. Pomijane jest tylko pobieranie audio z YouTube - plik audio
+jest wpisywany do manifestu zadania. Scenariusze różnią się liczbą napisów
+w transkrypcji i liczbą języków. Wynik (czasy etapów, przepustowość,
+statystyki atrap) jest zapisywany jako JSON.
+
+Przykład:
+    python benchmark.py --cues 50,500 --langs 1,5,9 --latency 0.2 --youtube-rpm 120 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import uuid
+
+from openai import OpenAI
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from metrics import METRICS
+from fake_servers import FakeBehaviour, FakeOpenAIHandler, FakeYouTubeHandler, start_server
+from job_manifest import JobManifest
+from openai_limiter import RateLimitedClient
+from pipeline import run_stages
+from workspace import Workspace
+from youtube_api import ApiStats
+import youtube_api
+import yt_caption_uploader as uploader
+
+BENCH_LANGS = ["en", "de", "zh", "ja", "es", "pt", "hi", "fr", "ru"]
+
+
+class FakeExtractor:
+    """Metadane filmu bez yt_dlp i bez sieci (zamiast SharedExtractor)."""
+
+    def extract(self, url):
+        return {"title": "Pierogi ruskie - przepis https://example.com/pierogi",
+                "description": "Opis filmu.\nWięcej na https://example.com"}
+
+
+def seed_duplicate_captions(youtube_server, video_id, languages):
+    """Po dwie ścieżki napisów w każdym z `languages` - synchronizacja usuwa nadmiarowe zapytaniem wsadowym."""
+    for language in languages:
+        for _ in range(2):
+            caption_id = uuid.uuid4().hex[:12]
+            youtube_server.captions[caption_id] = {
+                "id": caption_id,
+                "snippet": {"videoId": video_id, "language": language, "name": language, "trackKind": "standard"},
+            }
+
+
+def fake_youtube_service(youtube_url):
+    """
+    Klient YouTube kierujący wszystkie wywołania (również przesyłanie plików
+    i zapytania wsadowe) do atrapy - przez podmianę rootUrl w dokumencie discovery.
+    """
+    document = json.loads(get_static_doc("youtube", "v3"))
+    document["rootUrl"] = f"{youtube_url}/"
+    document["baseUrl"] = f"{youtube_url}/{document.get('servicePath', '')}"
+    return build_from_document(document, developerKey="fake")
+
+
+def run_scenario(cue_count, lang_count, openai_url, youtube_server, youtube_url, args):
+    langs = BENCH_LANGS[:lang_count]
+    video_id = f"bench{cue_count}x{lang_count}"
+    client = RateLimitedClient(OpenAI(api_key="fake", base_url=f"{openai_url}/v1", max_retries=0),
+                               rpm=args.client_rpm, tpm=args.client_tpm)
+    api_stats = ApiStats()
+    youtube_api.API_STATS.calls.clear()
+    seed_duplicate_captions(youtube_server, video_id, ["pl", langs[0]])
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="caption_bench_") as bench_dir:
+        # Stan synchronizacji napisów (caption_sync.json) i kopie eksportu trafiają do katalogu bieżącego
+        os.chdir(bench_dir)
+        try:
+            options = argparse.Namespace(
+                lang=",".join(["pl"] + langs), manifest_dir="manifests", work_dir="work", fresh=False,
+                preprocess=False, cut_silence=False, segment_seconds=600, jobs=args.jobs,
+                chunk_tokens=args.chunk_tokens, no_incremental=False, context_cues=2,
+                openai_batch=args.openai_batch, batch_poll_seconds=0.2, upload=True, client_secrets=None)
+
+            workspace = Workspace.for_video(video_id, options.work_dir)
+            audio_file = workspace.path("audio.m4a")
+            with open(audio_file, "wb") as f:
+                f.write(os.urandom(64 * 1024))
+            workspace.add("audio", audio_file)
+            JobManifest.for_video(video_id, options.manifest_dir).complete("audio", [audio_file], path=audio_file)
+
+            started = time.monotonic()
+            _, stage_times = run_stages(
+                uploader.build_stages(f"https://www.youtube.com/watch?v={video_id}", options, client, None,
+                                      FakeExtractor(), youtube=fake_youtube_service(youtube_url)),
+                max_workers=args.jobs)
+            total = time.monotonic() - started
+
+            workspace = Workspace.for_video(video_id, options.work_dir)
+            failures = [lang for lang in langs if not workspace.get(f"srt:{lang}")]
+        finally:
+            os.chdir(cwd)
+
+    timings = {name: round(end - start, 4) for name, (start, end) in stage_times.items()}
+    translated_cues = cue_count * (lang_count - len(failures))
+    for label, entry in youtube_api.API_STATS.calls.items():
+        api_stats.calls[label] = dict(entry)
+    return {
+        "cues": cue_count,
+        "languages": lang_count,
+        "stages": timings,
+        "total_seconds": round(total, 4),
+        "translated_cues_per_second": round(translated_cues / timings["translate_srt"], 2)
+        if timings["translate_srt"] else None,
+        "failed_languages": sorted(failures),
+        "remaining_captions": sum(1 for caption in youtube_server.captions.values()
+                                  if caption["snippet"]["videoId"] == video_id),
+        "openai_calls": {model: {"calls": limits.calls, "rate_limited": limits.rate_limited,
+                                 "rpm_wait_seconds": round(limits.requests.waited, 3),
+                                 "tpm_wait_seconds": round(limits.tokens.waited, 3)}
+                         for model, limits in client.models.items()},
+        "youtube_calls": api_stats.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark potoku napisów na lokalnych atrapach OpenAI i YouTube.')
+    parser.add_argument('--cues', default='50,500', help='Liczby napisów w syntetycznych SRT (np. 50,500,2000).')
+    parser.add_argument('--langs', default='1,5,9', help='Liczby języków docelowych (1-9).')
+    parser.add_argument('--latency', type=float, default=0.1, help='Stałe opóźnienie atrap (s).')
+    parser.add_argument('--latency-per-token', type=float, default=0.0002,
+                        help='Dodatkowe opóźnienie atrapy OpenAI na token odpowiedzi (s).')
+    parser.add_argument('--server-rpm', type=int, default=None, help='Limit zapytań/min atrapy OpenAI (429 powyżej).')
+    parser.add_argument('--youtube-rpm', type=int, default=None,
+                        help='Limit zapytań/min atrapy YouTube (429 powyżej).')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Prawdopodobieństwo błędu 503 w atrapach.')
+    parser.add_argument('--client-rpm', type=int, default=500, help='Startowy limit RPM klienta.')
+    parser.add_argument('--client-tpm', type=int, default=1000000, help='Startowy limit TPM klienta.')
+    parser.add_argument('--jobs', type=int, default=4, help='Równoległe tłumaczenia.')
+    parser.add_argument('--chunk-tokens', type=int, default=1500, help='Budżet tokenów fragmentu SRT.')
+    parser.add_argument('--openai-batch', action='store_true',
+                        help='Tłumaczenie napisów przez Batch API atrapy zamiast zapytań na bieżąco.')
+    parser.add_argument('--batch-seconds', type=float, default=1.0,
+                        help='Czas wykonania zlecenia Batch API przez atrapę (s).')
+    parser.add_argument('--seed', type=int, default=1, help='Ziarno losowania błędów.')
+    parser.add_argument('--output', default='bench_output.json', help='Plik wynikowy JSON.')
+    args = parser.parse_args()
+
+    openai_behaviour = FakeBehaviour(args.latency, args.latency_per_token, args.server_rpm, args.error_rate, args.seed,
+                                     args.batch_seconds)
+    youtube_behaviour = FakeBehaviour(args.latency, 0.0, args.youtube_rpm, args.error_rate, args.seed)
+    openai_server, openai_url = start_server(FakeOpenAIHandler, openai_behaviour)
+    youtube_server, youtube_url = start_server(FakeYouTubeHandler, youtube_behaviour)
+
+    results = []
+    try:
+        for cue_count in (int(value) for value in args.cues.split(',')):
+            for lang_count in (int(value) for value in args.langs.split(',')):
+                print(f"Scenariusz: {cue_count} napisów x {lang_count} języków...", flush=True)
+                # Whisper atrapy zwraca transkrypcję o długości scenariusza
+                openai_behaviour.transcript_cues = cue_count
+                with METRICS.video(f"bench{cue_count}x{lang_count}"):
+                    results.append(run_scenario(cue_count, lang_count, openai_url, youtube_server, youtube_url,
+                                                args))
+                print(json.dumps(results[-1]["stages"]), flush=True)
+    finally:
+        openai_server.shutdown()
+        youtube_server.shutdown()
+
+    report = {
+        "python": platform.python_version(),
+        "settings": vars(args),
+        "fake_openai": openai_behaviour.stats,
+        "fake_youtube": dict(youtube_behaviour.stats, uploaded_bytes=youtube_server.uploaded_bytes),
+        "scenarios": results,
+        "metrics": METRICS.report(),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Wyniki zapisane w {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+"""
+Lokalne atrapy API OpenAI (czat, transkrypcja, Batch API) i YouTube Data API
+(captions, videos) do testów wydajności bez sieci. Obie atrapy mają konfigurowalne
+opóźnienie, limit zapytań na minutę (odpowiedź 429 z nagłówkami jak
+w prawdziwym API) oraz wstrzykiwanie błędów 5xx z zadanym prawdopodobieństwem.
+"""
+
+import email.parser
+import email.policy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeBehaviour:
+    """
+    Parametry atrapy: `latency` - stałe opóźnienie odpowiedzi (s),
+    `latency_per_token` - dodatkowe opóźnienie na token odpowiedzi (s),
+    `rpm` - limit zapytań na minutę (None = bez limitu),
+    `error_rate` - prawdopodobieństwo odpowiedzi 503 (w Batch API - błędu
+    pojedynczego zapytania w pliku błędów), `batch_seconds` - czas od
+    utworzenia zlecenia Batch API do jego zakończenia (s),
+    `transcript_cues` - liczba napisów w transkrypcji zwracanej przez Whisper.
+    """
+
+    def __init__(self, latency=0.05, latency_per_token=0.0, rpm=None, error_rate=0.0, seed=None, batch_seconds=1.0,
+                 transcript_cues=20):
+        self.latency = latency
+        self.batch_seconds = batch_seconds
+        self.transcript_cues = transcript_cues
+        self.latency_per_token = latency_per_token
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "tokens": 0}
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Zwraca None albo (status, nagłówki) odpowiedzi odrzucającej zapytanie."""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            while self._window and now - self._window[0] > 60:
+                self._window.popleft()
+            if self.rpm and len(self._window) >= self.rpm:
+                self.stats["rate_limited"] += 1
+                retry_after = 60 - (now - self._window[0])
+                return 429, {"retry-after-ms": str(int(retry_after * 1000)), "retry-after": str(int(retry_after) + 1)}
+            self._window.append(now)
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 503, {}
+        return None
+
+    def rate_headers(self, tokens):
+        with self._lock:
+            self.stats["tokens"] += tokens
+            used = len(self._window)
+        if not self.rpm:
+            return {}
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(0, self.rpm - used)),
+            "x-ratelimit-reset-requests": f"{60 / self.rpm:.3f}s",
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    behaviour = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload=b"", content_type="application/json", headers=None):
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        elif isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _admit(self):
+        rejection = self.behaviour.admit()
+        if rejection is None:
+            return True
+        status, headers = rejection
+        self._send(status, {"error": {"code": status, "message": "fake server rejection"}}, headers=headers)
+        return False
+
+
+def estimate_fake_tokens(text):
+    return len(text) // 4 + 1
+
+
+class FakeOpenAIHandler(_Handler):
+    """
+    /v1/chat/completions - "tłumaczy" przez dopisanie [kod] do każdej linii tekstu
+    (SRT zachowuje numery i czasy, odpowiedź JSON - klucze i znaczniki URL),
+    /v1/audio/transcriptions - zwraca syntetyczny plik SRT,
+    /v1/files, /v1/batches - Batch API: zlecenie kończy się po `batch_seconds`,
+    a jego wyniki są liczone tak samo jak odpowiedzi /v1/chat/completions.
+    Pliki i zlecenia są trzymane w pamięci serwera (server.files, server.batches).
+    """
+
+    SRT_TIMING_RE = re.compile(r"^\d+$|-->")
+    LANG_RE = re.compile(r"\b([a-z]{2}) \(")
+
+    def do_GET(self):
+        if not self._admit():
+            return
+        path = urlparse(self.path).path.rstrip("/")
+        parts = path.split("/")
+        if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in self.server.batches:
+            self._send(200, self._batch_status(parts[-1]))
+        elif path.endswith("/content") and parts[-2] in self.server.files:
+            self._send(200, self.server.files[parts[-2]]["content"], content_type="application/octet-stream")
+        else:
+            self._send(404, {"error": {"message": f"unknown path {path}"}})
+
+    def do_POST(self):
+        body = self._body()
+        if not self._admit():
+            return
+        path = urlparse(self.path).path
+        if path.endswith("/chat/completions"):
+            completion, tokens = self._completion(json.loads(body))
+            time.sleep(self.behaviour.latency + completion["usage"]["completion_tokens"] * self.behaviour.latency_per_token)
+            self._send(200, completion, headers=self.behaviour.rate_headers(tokens))
+        elif path.endswith("/audio/transcriptions"):
+            self._transcription()
+        elif path.endswith("/files"):
+            self._upload_file(body)
+        elif path.endswith("/batches"):
+            self._create_batch(json.loads(body))
+        else:
+            self._send(404, {"error": {"message": f"unknown path {path}"}})
+
+    def _translate_lines(self, text, tag):
+        lines = []
+        for line in text.split("\n"):
+            if not line.strip() or self.SRT_TIMING_RE.search(line.strip()):
+                lines.append(line)
+            else:
+                lines.append(f"[{tag}] {line}")
+        return "\n".join(lines)
+
+    def _completion(self, request):
+        """Odpowiedź na zapytanie czatu i liczba jej tokenów."""
+        prompt = request["messages"][-1]["content"]
+        if request.get("response_format", {}).get("type") == "json_object":
+            source = json.loads(prompt[prompt.rindex("\n\n") + 2:])
+            langs = self.LANG_RE.findall(prompt.split("\n")[0])
+            content = json.dumps({
+                lang: {key: self._translate_lines(value, lang) for key, value in source.items()}
+                for lang in langs
+            }, ensure_ascii=False)
+        elif "Oto treść:\n\n" in prompt:
+            content = self._translate_lines(prompt.split("Oto treść:\n\n", 1)[1], "tr")
+        else:
+            content = self._translate_lines(prompt, "tr")
+
+        prompt_tokens = estimate_fake_tokens(prompt)
+        completion_tokens = estimate_fake_tokens(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }, prompt_tokens + completion_tokens
+
+    def _store_file(self, filename, content, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        self.server.files[file_id] = {"filename": filename, "content": content, "purpose": purpose}
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+
+    def _upload_file(self, body):
+        # Treść multipart/form-data jest parsowana jak wiadomość e-mail
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode("ascii") + b"\r\n\r\n" + body)
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        upload = fields["file"]
+        self._send(200, self._store_file(upload.get_filename(), upload.get_payload(decode=True),
+                                         fields["purpose"].get_content().strip()))
+
+    def _create_batch(self, request):
+        if request.get("input_file_id") not in self.server.files:
+            self._send(400, {"error": {"message": "unknown input_file_id"}})
+            return
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        self.server.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"], "completion_window": request["completion_window"],
+            "status": "in_progress", "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self.server.batch_deadlines[batch_id] = time.monotonic() + self.behaviour.batch_seconds
+        self._send(200, self._batch_status(batch_id))
+
+    def _batch_status(self, batch_id):
+        """Stan zlecenia; po upływie `batch_seconds` zlecenie jest wykonywane (raz) i kończone."""
+        with self.server.batch_lock:
+            batch = self.server.batches[batch_id]
+            if batch["status"] == "in_progress" and time.monotonic() >= self.server.batch_deadlines[batch_id]:
+                self._run_batch(batch)
+            return dict(batch)
+
+    def _run_batch(self, batch):
+        outputs, errors = [], []
+        lines = self.server.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+        for line in filter(str.strip, lines):
+            entry = json.loads(line)
+            result = {"id": f"batch_req_{uuid.uuid4().hex[:24]}", "custom_id": entry["custom_id"]}
+            if self.behaviour.error_rate and self.behaviour.random.random() < self.behaviour.error_rate:
+                self.behaviour.stats["errors"] += 1
+                errors.append(dict(result, error=None, response={
+                    "status_code": 500, "body": {"error": {"message": "fake batch request failure"}}}))
+                continue
+            completion, tokens = self._completion(entry["body"])
+            self.behaviour.stats["tokens"] += tokens
+            outputs.append(dict(result, error=None, response={
+                "status_code": 200, "request_id": uuid.uuid4().hex, "body": completion}))
+
+        def store(entries, suffix):
+            if not entries:
+                return None
+            content = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8")
+            return self._store_file(f"{batch['id']}_{suffix}.jsonl", content, "batch_output")["id"]
+
+        batch.update(status="completed", completed_at=int(time.time()),
+                     output_file_id=store(outputs, "output"), error_file_id=store(errors, "error"),
+                     request_counts={"total": len(outputs) + len(errors), "completed": len(outputs),
+                                     "failed": len(errors)})
+
+    def _transcription(self):
+        def timestamp(ms):
+            return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+        cues = []
+        for number in range(1, self.behaviour.transcript_cues + 1):
+            start = (number - 1) * 3000
+            cues.append(f"{number}\n{timestamp(start)} --> {timestamp(start + 2500)}\n"
+                        f"Zdanie numer {number} z przykładowego filmu kulinarnego o pierogach.")
+        time.sleep(self.behaviour.latency)
+        self._send(200, "\n\n".join(cues) + "\n", content_type="text/plain",
+                   headers=self.behaviour.rate_headers(0))
+
+
+class FakeYouTubeHandler(_Handler):
+    """
+    Minimalna atrapa YouTube Data API v3: captions.list/insert/update/delete
+    (z przesyłaniem wznawialnym), videos.list/update oraz zapytania wsadowe
+    (/batch) z captions.delete. Stan jest trzymany w pamięci
+    serwera (server.captions, server.videos).
+    """
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        return parsed.path.rstrip("/"), {key: values[0] for key, values in parse_qs(parsed.query).items()}
+
+    def do_GET(self):
+        if not self._admit():
+            return
+        path, query = self._route()
+        time.sleep(self.behaviour.latency)
+        if path.endswith("/youtube/v3/captions"):
+            items = [c for c in self.server.captions.values() if c["snippet"]["videoId"] == query.get("videoId")]
+            self._send(200, {"kind": "youtube#captionListResponse", "items": items})
+        elif path.endswith("/youtube/v3/videos"):
+            video = self.server.videos.setdefault(query.get("id"), {
+                "id": query.get("id"),
+                "snippet": {"title": "Film testowy", "description": "", "categoryId": "22"},
+            })
+            self._send(200, {"kind": "youtube#videoListResponse", "items": [video]})
+        else:
+            self._send(404, {"error": {"message": f"unknown path {path}"}})
+
+    def do_DELETE(self):
+        if not self._admit():
+            return
+        path, query = self._route()
+        time.sleep(self.behaviour.latency)
+        self.server.captions.pop(query.get("id"), None)
+        self._send(204)
+
+    def do_POST(self):
+        body = self._body()
+        if not self._admit():
+            return
+        path, query = self._route()
+        time.sleep(self.behaviour.latency)
+        if path == "/batch" or path.startswith("/batch/"):
+            self._batch(body)
+        elif path.startswith("/upload/") and query.get("uploadType") == "resumable":
+            self._start_session("insert", json.loads(body or b"{}"))
+        elif path.startswith("/upload/"):
+            self._send(400, {"error": {"message": "only resumable uploads are supported"}})
+        else:
+            self._send(404, {"error": {"message": f"unknown path {path}"}})
+
+    def do_PUT(self):
+        body = self._body()
+        if not self._admit():
+            return
+        path, query = self._route()
+        time.sleep(self.behaviour.latency)
+        if path.startswith("/upload-session/"):
+            self._finish_session(path.rsplit("/", 1)[-1], body)
+        elif path.startswith("/upload/") and query.get("uploadType") == "resumable":
+            self._start_session("update", json.loads(body or b"{}"))
+        elif path.endswith("/youtube/v3/videos"):
+            video = json.loads(body)
+            stored = self.server.videos.setdefault(video["id"], {"id": video["id"], "snippet": {}})
+            stored.update(video)
+            self._send(200, stored)
+        else:
+            self._send(404, {"error": {"message": f"unknown path {path}"}})
+
+    def _batch(self, body):
+        """Zapytanie wsadowe multipart/mixed: każda część to osobne zapytanie HTTP (obsługiwane captions.delete)."""
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode("ascii") + b"\r\n\r\n" + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.iter_parts():
+            request_line = part.get_payload(decode=True).decode("utf-8").split("\n", 1)[0].strip()
+            method, target, _ = request_line.split(" ", 2)
+            parsed = urlparse(target)
+            query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+            if method == "DELETE" and parsed.path.rstrip("/").endswith("/youtube/v3/captions"):
+                found = self.server.captions.pop(query.get("id"), None) is not None
+                status = "204 No Content" if found else "404 Not Found"
+            else:
+                status = "400 Bad Request"
+            content_id = part["Content-ID"].strip("<>")
+            parts.append(f"--{boundary}\r\nContent-Type: application/http\r\n"
+                         f"Content-ID: <response-{content_id}>\r\n\r\nHTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n\r\n")
+        self._send(200, "".join(parts) + f"--{boundary}--\r\n", content_type=f"multipart/mixed; boundary={boundary}")
+
+    def _start_session(self, action, metadata):
+        session_id = uuid.uuid4().hex
+        self.server.sessions[session_id] = (action, metadata)
+        host = self.headers.get("Host")
+        self._send(200, b"", headers={"Location": f"http://{host}/upload-session/{session_id}"})
+
+    def _finish_session(self, session_id, body):
+        action, metadata = self.server.sessions.pop(session_id)
+        self.server.uploaded_bytes += len(body)
+        if action == "insert":
+            caption_id = uuid.uuid4().hex[:12]
+            caption = {"id": caption_id, "snippet": dict(metadata["snippet"], trackKind="standard")}
+        else:
+            caption = self.server.captions[metadata["id"]]
+            caption["snippet"].update(metadata.get("snippet", {}))
+        self.server.captions[caption["id"]] = caption
+        self._send(200, caption)
+
+
+def start_server(handler, behaviour):
+    """Uruchomienie atrapy na losowym porcie w wątku w tle. Zwraca (serwer, bazowy_url)."""
+    handler_class = type(handler.__name__, (handler,), {"behaviour": behaviour})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    server.captions, server.videos, server.sessions, server.uploaded_bytes = {}, {}, {}, 0
+    server.files, server.batches, server.batch_deadlines, server.batch_lock = {}, {}, {}, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
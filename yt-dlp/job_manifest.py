@@ -0,0 +1,79 @@
+"""
+Manifest zadania dla jednego filmu: zapis ukończonych etapów potoku
+(metadane, audio, transkrypcja, napisy w każdym języku, lokalizacje,
+publikacja) razem ze skrótami SHA-256 utworzonych plików. Ponowne
+uruchomienie pomija etapy, których wyniki są nadal na dysku i mają
+ten sam skrót.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_MANIFEST_DIR = "manifests"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class JobManifest:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.stages = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.stages = json.load(f).get("stages", {})
+
+    @classmethod
+    def for_video(cls, video_id, manifest_dir=DEFAULT_MANIFEST_DIR):
+        os.makedirs(manifest_dir, exist_ok=True)
+        return cls(os.path.join(manifest_dir, f"{video_id}.json"))
+
+    def _save(self):
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.stages}, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, self.path)
+
+    def complete(self, stage, files=(), **data):
+        """Zapis ukończonego etapu wraz ze skrótami jego plików i dodatkowymi danymi."""
+        entry = {
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "files": {path: file_sha256(path) for path in files},
+            "data": data,
+        }
+        with self._lock:
+            self.stages[stage] = entry
+            self._save()
+
+    def data(self, stage):
+        with self._lock:
+            entry = self.stages.get(stage)
+        return None if entry is None else entry["data"]
+
+    def done(self, stage, **expected):
+        """
+        Czy etap jest ukończony: wpis istnieje, wszystkie jego pliki są na miejscu
+        z tym samym skrótem, a zapisane dane zgadzają się z `expected`
+        (np. skrótem pliku źródłowego).
+        """
+        with self._lock:
+            entry = self.stages.get(stage)
+        if entry is None:
+            return False
+        if any(entry["data"].get(key) != value for key, value in expected.items()):
+            return False
+        return all(os.path.exists(path) and file_sha256(path) == digest
+                   for path, digest in entry["files"].items())
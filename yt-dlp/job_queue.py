@@ -0,0 +1,118 @@
+"""
+Kolejka zadań dla trybu pracy ciągłej (--worker) w pliku SQLite.
+Zadania dodaje się poleceniem z --enqueue (albo bezpośrednio INSERT-em
+do tabeli jobs), a proces roboczy pobiera je po kolei. Pobranie zadania
+jest atomowe, więc z jednej kolejki może korzystać kilka procesów.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+DEFAULT_QUEUE_PATH = "jobs.sqlite"
+
+QUEUED, RUNNING, DONE, FAILED, DEFERRED = "queued", "running", "done", "failed", "deferred"
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        self.worker = _worker_name()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " url TEXT NOT NULL,"
+            " options TEXT NOT NULL DEFAULT '{}',"
+            " status TEXT NOT NULL DEFAULT 'queued',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+
+    def add(self, url, **options):
+        """Dodanie zadania; `options` nadpisują ustawienia procesu roboczego (np. lang="en,de")."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (url, options, created_at) VALUES (?, ?, ?)",
+                (url, json.dumps(options, ensure_ascii=False), time.time())
+            )
+            return cursor.lastrowid
+
+    def claim(self):
+        """Pobranie najstarszego oczekującego zadania: (id, url, opcje) albo None."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, url, options FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, started_at = ?"
+                        " WHERE id = ?",
+                        (RUNNING, self.worker, time.time(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def finish(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def requeue_interrupted(self):
+        """
+        Zadania pozostawione jako "running" przez proces z tego komputera, który już
+        nie działa, wracają do kolejki (manifest zadania pozwala wznowić je od
+        pierwszego nieukończonego etapu). Zwraca liczbę przywróconych zadań.
+        """
+        host = socket.gethostname()
+        with self._lock:
+            rows = self._conn.execute("SELECT id, worker FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            stale = []
+            for job_id, worker in rows:
+                worker_host, _, pid = (worker or "").rpartition(":")
+                if worker_host == host and pid.isdigit() and not _process_alive(int(pid)):
+                    stale.append(job_id)
+            for job_id in stale:
+                self._conn.execute("UPDATE jobs SET status = ?, worker = NULL WHERE id = ?", (QUEUED, job_id))
+            return len(stale)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,232 @@
+"""
+Metryki przebiegu potoku napisów: czas etapów, przesłane bajty, tokeny
+wejściowe i wyjściowe, liczba wywołań i ponowień API - łącznie dla każdego
+etapu oraz osobno dla każdego filmu i etapu. Bieżący film i etap są trzymane
+w zmiennych kontekstu (contextvars), więc liczniki z wątków pomocniczych
+trafiają do właściwego etapu, o ile zadania są uruchamiane przez in_context().
+
+Wyniki można zapisać jako raport JSON (sumy i historia filmów, którą można
+ograniczyć do ostatnich `max_videos` filmów) oraz plik tekstowy Prometheus
+z samymi sumami na etap (dla node_exporter --collector.textfile).
+SamplingProfiler to prosty profiler próbkujący stosy wszystkich wątków.
+"""
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+
+from workspace import atomic_write_text
+
+_video = contextvars.ContextVar("metrics_video", default="")
+_stage = contextvars.ContextVar("metrics_stage", default="")
+
+# Etykieta liczników zebranych poza etapami potoku (np. uwierzytelnianie przed startem)
+NO_STAGE = "-"
+
+
+def in_context(func):
+    """
+    Opakowanie funkcji uruchamianej w puli wątków tak, aby działała
+    w kontekście (film, etap) wątku, który ją przekazał.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # Każde wywołanie dostaje własną kopię - kontekstu nie można wejść z dwóch wątków naraz
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+def _new_entry():
+    return {"seconds": 0.0, "counters": Counter(), "models": {}}
+
+
+class RunMetrics:
+    def __init__(self, max_videos=None):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        # Sumy na etap - stałej wielkości niezależnie od liczby filmów
+        self.totals = {}
+        # Historia (film, etap); przy `max_videos` najstarsze filmy są z niej usuwane (sumy zostają)
+        self.stages = {}
+        self.max_videos = max_videos
+        self._videos = {}
+        self.dropped_videos = 0
+
+    def _entries(self, video, stage):
+        # Wywoływane pod blokadą
+        if video not in self._videos:
+            self._videos[video] = None
+            if self.max_videos is not None and len(self._videos) > self.max_videos:
+                oldest = next(iter(self._videos))
+                del self._videos[oldest]
+                self.stages = {key: entry for key, entry in self.stages.items() if key[0] != oldest}
+                self.dropped_videos += 1
+        return (self.totals.setdefault(stage, _new_entry()),
+                self.stages.setdefault((video, stage), _new_entry()))
+
+    @contextmanager
+    def video(self, video_id):
+        token = _video.set(video_id)
+        try:
+            yield
+        finally:
+            _video.reset(token)
+
+    @contextmanager
+    def stage(self, name):
+        """Pomiar czasu etapu; liczniki zapisane w jego trakcie są przypisywane do tego etapu."""
+        token = _stage.set(name)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            _stage.reset(token)
+            with self._lock:
+                for entry in self._entries(_video.get(), name):
+                    entry["seconds"] += elapsed
+
+    def add(self, model=None, **counters):
+        """Zwiększenie liczników bieżącego etapu (np. add(youtube_calls=1, youtube_retries=2))."""
+        with self._lock:
+            for entry in self._entries(_video.get(), _stage.get() or NO_STAGE):
+                entry["counters"].update(counters)
+                if model is not None:
+                    entry["models"].setdefault(model, Counter()).update(counters)
+
+    def report(self):
+        """Raport przebiegu jako słownik gotowy do zapisania w JSON."""
+        def summary(entry):
+            return {
+                "seconds": round(entry["seconds"], 3),
+                **entry["counters"],
+                "models": {model: dict(counters) for model, counters in entry["models"].items()},
+            }
+
+        with self._lock:
+            totals = Counter()
+            models = {}
+            for entry in self.totals.values():
+                totals.update(entry["counters"])
+                for model, counters in entry["models"].items():
+                    models.setdefault(model, Counter()).update(counters)
+            stages = {stage: summary(entry) for stage, entry in sorted(self.totals.items())}
+            videos = {}
+            for (video, stage), entry in sorted(self.stages.items()):
+                videos.setdefault(video or NO_STAGE, {})[stage] = summary(entry)
+            dropped = self.dropped_videos
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "wall_seconds": round(time.time() - self.started_at, 3),
+            "totals": dict(totals),
+            "models": {model: dict(counters) for model, counters in models.items()},
+            "stages": stages,
+            "videos": videos,
+            "dropped_videos": dropped,
+        }
+
+    def write_json(self, path, **extra):
+        report = dict(self.report(), **extra)
+        atomic_write_text(path, json.dumps(report, indent=2, ensure_ascii=False))
+        return report
+
+    def write_prometheus(self, path, prefix="caption_pipeline"):
+        """
+        Zapis w formacie tekstowym Prometheus (atomowo - plik czytany przez node_exporter).
+        Tylko sumy na etap: etykieta filmu dawałaby nowe serie przy każdym filmie.
+        """
+        def escape(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+        with self._lock:
+            samples = {}
+            for stage, entry in sorted(self.totals.items()):
+                labels = f'stage="{escape(stage)}"'
+                samples.setdefault(f"{prefix}_stage_seconds", []).append((labels, entry["seconds"]))
+                for name, value in entry["counters"].items():
+                    samples.setdefault(f"{prefix}_{name}_total", []).append((labels, value))
+                for model, counters in entry["models"].items():
+                    model_labels = f'{labels},model="{escape(model)}"'
+                    for name, value in counters.items():
+                        samples.setdefault(f"{prefix}_model_{name}_total", []).append((model_labels, value))
+
+        lines = []
+        for metric, values in sorted(samples.items()):
+            lines.append(f"# TYPE {metric} {'gauge' if metric.endswith('_seconds') else 'counter'}")
+            lines.extend(f"{metric}{{{labels}}} {value}" for labels, value in values)
+        lines.append(f"{prefix}_last_run_timestamp_seconds {time.time():.0f}")
+        atomic_write_text(path, "\n".join(lines) + "\n")
+
+
+METRICS = RunMetrics()
+
+
+def record(model=None, **counters):
+    METRICS.add(model=model, **counters)
+
+
+class SamplingProfiler:
+    """
+    Profiler próbkujący: co `interval` sekund zapisuje stosy wszystkich wątków
+    (sys._current_frames). Wynik to plik w formacie "collapsed stacks"
+    (wejście dla flamegraph.pl / speedscope) oraz zestawienie najczęstszych funkcji.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        atomic_write_text(path, "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()))
+
+    def summary(self, limit=15):
+        """
+        Funkcje najczęściej będące na szczycie stosu (czas własny, łącznie
+        z oczekiwaniem na sieć i blokady - wątki bezczynne widać jako wait).
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        lines = [f"Profil ({self.samples} próbek co {self.interval * 1000:.0f} ms, wszystkie wątki):"]
+        for frame, count in leaves.most_common(limit):
+            lines.append(f"  {count / total:6.1%}  {frame}")
+        return "\n".join(lines)
@@ -0,0 +1,164 @@
+"""
+Wysyłanie wielu zapytań czatu naraz przez OpenAI Batch API.
+
+Zapytania są zbierane pod identyfikatorami wybranymi przez wywołującego
+(custom_id), zapisywane jako JSONL, przesyłane przez
+`files.create(purpose="batch")` i zlecane przez `batches.create`. Następnie
+zlecenie jest odpytywane aż do stanu końcowego, a pliki wyników (i błędów)
+są pobierane i przypisywane z powrotem do identyfikatorów. Zapytania wsadowe
+są tańsze i nie wliczają się do limitów zapytań na bieżąco, ale wynik
+przychodzi w oknie realizacji (do 24 godzin), a nie od razu.
+
+Zlecenia większe niż limity API są dzielone na kilka. Jeśli podano
+`state_path`, identyfikatory wysłanych zleceń są tam zapisywane, więc
+przerwany w trakcie oczekiwania przebieg wznawia odpytywanie tych samych
+zleceń zamiast wysyłać je (i płacić za nie) ponownie.
+
+UWAGA: polski odpowiednik translate-file-with-openia/openai_batch.py
+(komunikaty w języku tego katalogu); zmiany w działaniu wprowadzać w obu plikach.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_POLL_SECONDS = 60
+CHAT_ENDPOINT = "/v1/chat/completions"
+
+# Limity API dla jednego pliku wejściowego zlecenia, z zapasem na rozmiarze
+MAX_BATCH_REQUESTS = 50000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchError(Exception):
+    """Zapytanie ze zlecenia, które nie dało wyniku."""
+
+
+def message_text(body):
+    """Tekst odpowiedzi z treści odpowiedzi czatu w pliku wyników zlecenia."""
+    return body["choices"][0]["message"]["content"]
+
+
+class BatchSubmission:
+    def __init__(self, client, endpoint=CHAT_ENDPOINT, completion_window="24h"):
+        self.client = client
+        self.endpoint = endpoint
+        self.completion_window = completion_window
+        self.requests = []
+
+    def __len__(self):
+        return len(self.requests)
+
+    def add(self, custom_id, **body):
+        """Dodanie zapytania; `body` to argumenty zwykłego wywołania (model, messages...)."""
+        self.requests.append((str(custom_id), body))
+
+    def _input_files(self):
+        """Zawartość JSONL plików wejściowych, podzielona tak, by zmieścić się w limitach API."""
+        lines, size = [], 0
+        for custom_id, body in self.requests:
+            line = json.dumps({"custom_id": custom_id, "method": "POST", "url": self.endpoint, "body": body},
+                              ensure_ascii=False).encode("utf-8") + b"\n"
+            if lines and (len(lines) >= MAX_BATCH_REQUESTS or size + len(line) > MAX_BATCH_BYTES):
+                yield b"".join(lines)
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line)
+        if lines:
+            yield b"".join(lines)
+
+    def _fingerprint(self):
+        digest = hashlib.sha256(self.endpoint.encode("utf-8"))
+        for custom_id, body in self.requests:
+            digest.update(json.dumps([custom_id, body], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
+    def submit(self):
+        """Przesłanie zapytań i utworzenie zleceń. Zwraca identyfikatory zleceń."""
+        batch_ids = []
+        for number, data in enumerate(self._input_files(), 1):
+            input_file = self.client.files.create(file=(f"batch-{number}.jsonl", data), purpose="batch")
+            batch = self.client.batches.create(input_file_id=input_file.id, endpoint=self.endpoint,
+                                               completion_window=self.completion_window)
+            requests = data.count(b"\n")
+            print(f"Wysłano zlecenie {batch.id} ({requests} zapytań)", flush=True)
+            batch_ids.append(batch.id)
+        return batch_ids
+
+    def wait(self, batch_ids, poll_seconds=DEFAULT_POLL_SECONDS, timeout=None):
+        """Odpytywanie, aż każde zlecenie osiągnie stan końcowy. Zwraca obiekty zleceń."""
+        started = time.monotonic()
+        done, last_status = {}, {}
+        while len(done) < len(batch_ids):
+            for batch_id in batch_ids:
+                if batch_id in done:
+                    continue
+                batch = self.client.batches.retrieve(batch_id)
+                counts = batch.request_counts
+                status = f"{batch.status} ({counts.completed + counts.failed}/{counts.total})" if counts else batch.status
+                if last_status.get(batch_id) != status:
+                    print(f"Zlecenie {batch_id}: {status}", flush=True)
+                    last_status[batch_id] = status
+                if batch.status in FINAL_STATUSES:
+                    done[batch_id] = batch
+            if len(done) < len(batch_ids):
+                if timeout is not None and time.monotonic() - started > timeout:
+                    raise TimeoutError(f"Zlecenia nadal w toku po {timeout:.0f} s: "
+                                       f"{', '.join(b for b in batch_ids if b not in done)}")
+                time.sleep(poll_seconds)
+        return [done[batch_id] for batch_id in batch_ids]
+
+    def _read_file(self, file_id):
+        for line in self.client.files.content(file_id).text.splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+    def results(self, batches):
+        """Przypisanie każdemu custom_id treści odpowiedzi albo BatchError, gdy nie ma użytecznego wyniku."""
+        results = {}
+        for batch in batches:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                for entry in self._read_file(file_id):
+                    response = entry.get("response") or {}
+                    body = response.get("body") or {}
+                    if entry.get("error") or response.get("status_code") != 200:
+                        error = entry.get("error") or body.get("error") or {}
+                        results[entry["custom_id"]] = BatchError(
+                            f"{error.get('message') or 'zapytanie nieudane'} (status {response.get('status_code')})")
+                    else:
+                        results[entry["custom_id"]] = body
+
+        statuses = ", ".join(sorted({batch.status for batch in batches}))
+        for custom_id, _ in self.requests:
+            results.setdefault(custom_id, BatchError(f"brak wyniku w pliku wyników (zlecenie: {statuses})"))
+        return results
+
+    def run(self, poll_seconds=DEFAULT_POLL_SECONDS, timeout=None, state_path=None):
+        """Wysłanie (albo wznowienie z `state_path`), oczekiwanie i zwrot {custom_id: treść albo BatchError}."""
+        if not self.requests:
+            return {}
+        fingerprint = self._fingerprint()
+        batch_ids = None
+        if state_path and os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("fingerprint") == fingerprint:
+                batch_ids = state["batch_ids"]
+                print(f"Wznawianie zleceń z {state_path}: {', '.join(batch_ids)}", flush=True)
+
+        if batch_ids is None:
+            batch_ids = self.submit()
+            if state_path:
+                with open(state_path, "w", encoding="utf-8") as f:
+                    json.dump({"fingerprint": fingerprint, "batch_ids": batch_ids,
+                               "submitted_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+
+        results = self.results(self.wait(batch_ids, poll_seconds, timeout))
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        return results
@@ -0,0 +1,238 @@
+"""
+Ograniczanie tempa zapytań do OpenAI (RPM/TPM) kubełkami tokenów - osobno
+dla każdego modelu. Koszt zapytania w tokenach jest szacowany z góry,
+a limity są na bieżąco korygowane nagłówkami x-ratelimit-* z odpowiedzi.
+Zapytania, dla których brakuje limitu, czekają w kolejce zamiast kończyć
+się błędem 429. Błędy przejściowe (5xx, problemy z połączeniem) są
+ponawiane z wykładniczym opóźnieniem (`max_error_retries` razy).
+
+RateLimitedClient udostępnia ten sam interfejs co klient OpenAI dla
+client.chat.completions.create i client.audio.transcriptions.create,
+więc może go zastąpić bez zmian w pozostałym kodzie. Klient OpenAI może
+powstać dopiero przy pierwszym zapytaniu (`client_factory`), dzięki czemu
+przebiegi niewymagające OpenAI nie importują biblioteki openai.
+"""
+
+import functools
+import random
+import re
+import threading
+import time
+
+from types import SimpleNamespace
+
+from srt_tools import estimate_tokens
+from metrics import record
+
+# Zachowawcze limity startowe - po pierwszej odpowiedzi zastępują je nagłówki
+DEFAULT_RPM = 500
+DEFAULT_TPM = 30000
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset(value):
+    """Czas z nagłówka x-ratelimit-reset-* (np. "1s", "6m0s", "20ms") w sekundach."""
+    if not value:
+        return None
+    parts = DURATION_RE.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _retry_after(headers):
+    """Czas oczekiwania z nagłówków retry-after-ms / retry-after w sekundach."""
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class TokenBucket:
+    """
+    Kubełek tokenów: pojemność `capacity` odnawiana w całości w ciągu `period`
+    sekund. acquire() blokuje, dopóki w kubełku nie będzie dość tokenów.
+    Poziom może spaść poniżej zera (dług), gdy rzeczywisty koszt przekroczy szacunek.
+    """
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.period = period
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / self.period)
+        self.updated = now
+
+    def acquire(self, amount):
+        amount = min(float(amount), self.capacity)
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    self.waited += time.monotonic() - started
+                    return
+                missing = amount - self.level
+                self._cond.wait(missing * self.period / self.capacity)
+
+    def adjust(self, delta):
+        """Korekta poziomu po poznaniu rzeczywistego kosztu (delta > 0 oznacza dodatkowe zużycie)."""
+        with self._cond:
+            self._refill()
+            self.level -= delta
+            self._cond.notify_all()
+
+    def update(self, limit=None, remaining=None, reset=None):
+        """Dopasowanie kubełka do limitów zgłoszonych przez serwer."""
+        with self._cond:
+            self._refill()
+            if limit:
+                self.capacity = float(limit)
+            if remaining is not None:
+                self.level = min(self.level, float(remaining))
+                # Serwer odnawia brakującą część w ciągu `reset` sekund
+                if reset and self.capacity > remaining:
+                    self.period = max(1.0, reset * self.capacity / (self.capacity - remaining))
+            self._cond.notify_all()
+
+
+class ModelLimits:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.calls = 0
+        self.rate_limited = 0
+
+    def update_from_headers(self, headers):
+        def number(name):
+            value = headers.get(name)
+            try:
+                return int(value) if value is not None else None
+            except ValueError:
+                return None
+
+        self.requests.update(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"),
+                             parse_reset(headers.get("x-ratelimit-reset-requests")))
+        self.tokens.update(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"),
+                           parse_reset(headers.get("x-ratelimit-reset-tokens")))
+
+
+def estimate_request_tokens(kwargs):
+    """Szacunkowy koszt zapytania czatu: wejście plus oczekiwane wyjście (dla tłumaczeń ~ wejście)."""
+    prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in kwargs.get("messages", []))
+    return prompt_tokens + (kwargs.get("max_tokens") or prompt_tokens)
+
+
+class _Endpoint:
+    def __init__(self, owner, path, estimate):
+        self._owner = owner
+        self._path = path
+        self._estimate = estimate
+
+    def create(self, **kwargs):
+        endpoint = functools.reduce(getattr, self._path, self._owner.client)
+        return self._owner.call(endpoint, kwargs, self._estimate(kwargs))
+
+
+class RateLimitedClient:
+    def __init__(self, client=None, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_wait_retries=8, client_factory=None,
+                 max_error_retries=3):
+        if client is None and client_factory is None:
+            raise ValueError("Wymagany jest client albo client_factory.")
+        self._client = client
+        self._client_factory = client_factory
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait_retries = max_wait_retries
+        self.max_error_retries = max_error_retries
+        self.models = {}
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(
+            completions=_Endpoint(self, ("chat", "completions"), estimate_request_tokens)
+        )
+        # Whisper jest ograniczany tylko liczbą zapytań
+        self.audio = SimpleNamespace(
+            transcriptions=_Endpoint(self, ("audio", "transcriptions"), lambda kwargs: 0)
+        )
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def limits(self, model):
+        with self._lock:
+            if model not in self.models:
+                self.models[model] = ModelLimits(self.rpm, self.tpm)
+            return self.models[model]
+
+    def call(self, endpoint, kwargs, estimated_tokens):
+        from openai import RateLimitError, APIConnectionError, InternalServerError
+
+        limits = self.limits(kwargs.get("model", ""))
+        rate_limited = failed = 0
+        while True:
+            limits.requests.acquire(1)
+            if estimated_tokens:
+                limits.tokens.acquire(estimated_tokens)
+            try:
+                raw = endpoint.with_raw_response.create(**kwargs)
+            except RateLimitError as e:
+                limits.rate_limited += 1
+                record(model=kwargs.get("model"), openai_retries=1)
+                if rate_limited == self.max_wait_retries:
+                    raise
+                headers = e.response.headers
+                limits.update_from_headers(headers)
+                delay = _retry_after(headers) or min(60.0, 2.0 ** rate_limited)
+                rate_limited += 1
+                print(f"Limit OpenAI ({kwargs.get('model')}) - oczekiwanie {delay:.1f} s...", flush=True)
+                time.sleep(delay)
+                continue
+            except (APIConnectionError, InternalServerError) as e:
+                # Błędy przejściowe (5xx, zerwane połączenie, przekroczony czas, w tym APITimeoutError)
+                # - biblioteka openai ich nie ponawia, bo działa z max_retries=0
+                record(model=kwargs.get("model"), openai_retries=1)
+                if failed == self.max_error_retries:
+                    raise
+                delay = min(30.0, 0.5 * 2.0 ** failed) * (1 + random.random() / 4)
+                failed += 1
+                print(f"Błąd OpenAI ({kwargs.get('model')}): {type(e).__name__} - ponowienie "
+                      f"{failed}/{self.max_error_retries} za {delay:.1f} s...", flush=True)
+                time.sleep(delay)
+                continue
+
+            limits.calls += 1
+            limits.update_from_headers(raw.headers)
+            result = raw.parse()
+            usage = getattr(result, "usage", None)
+            if usage is not None and estimated_tokens:
+                limits.tokens.adjust(usage.total_tokens - estimated_tokens)
+            record(model=kwargs.get("model"), openai_calls=1,
+                   tokens_in=getattr(usage, "prompt_tokens", 0) or 0,
+                   tokens_out=getattr(usage, "completion_tokens", 0) or 0)
+            return result
+
+    def summary(self):
+        lines = ["Wywołania OpenAI:"]
+        for model, limits in sorted(self.models.items()):
+            lines.append(f"  {model:<14} {limits.calls:4d} wyw.  {limits.rate_limited:3d} x 429  "
+                         f"oczekiwanie RPM {limits.requests.waited:.1f} s, TPM {limits.tokens.waited:.1f} s")
+        return "\n".join(lines)
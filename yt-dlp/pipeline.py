@@ -0,0 +1,113 @@
+"""
+Prosty współbieżny harmonogram etapów zależnych od siebie (graf DAG).
+Każdy etap uruchamia się, gdy tylko zakończą się wszystkie jego zależności,
+więc niezależne gałęzie (np. tłumaczenie metadanych i pobieranie audio)
+wykonują się równolegle.
+"""
+
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from metrics import METRICS, in_context
+
+# func otrzymuje słownik {nazwa_zależności: wynik} i zwraca wynik etapu
+Stage = namedtuple("Stage", ["name", "func", "deps"])
+
+
+class StageError(Exception):
+    """Błąd co najmniej jednego etapu potoku."""
+
+    def __init__(self, failures, results, timings):
+        self.failures = failures
+        self.results = results
+        self.timings = timings
+        names = ", ".join(f"{name}: {error}" for name, error in failures.items())
+        super().__init__(f"Nieudane etapy: {names}")
+
+
+def _check_graph(stages):
+    names = {stage.name for stage in stages}
+    if len(names) != len(stages):
+        raise ValueError("Nazwy etapów muszą być unikalne.")
+    for stage in stages:
+        unknown = set(stage.deps) - names
+        if unknown:
+            raise ValueError(f"Etap {stage.name} zależy od nieznanych etapów: {', '.join(sorted(unknown))}")
+
+    visiting, done = set(), set()
+    by_name = {stage.name: stage for stage in stages}
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Cykl w zależnościach etapów (etap {name}).")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for stage in stages:
+        visit(stage.name)
+
+
+def run_stages(stages, max_workers=4):
+    """
+    Uruchomienie etapów zgodnie z zależnościami.
+    Zwraca (wyniki, czasy), gdzie czasy to {nazwa: (start, koniec)} w sekundach
+    liczonych od początku potoku. Etapy zależne od nieudanego etapu są pomijane,
+    a na końcu zgłaszany jest StageError. Czas i liczniki każdego etapu trafiają
+    do metryk przebiegu (metrics.METRICS).
+    """
+    _check_graph(stages)
+    results, timings, failures = {}, {}, {}
+    waiting = list(stages)
+    origin = time.monotonic()
+
+    def run(stage):
+        started = time.monotonic() - origin
+        try:
+            with METRICS.stage(stage.name):
+                return stage.func({dep: results[dep] for dep in stage.deps})
+        finally:
+            timings[stage.name] = (started, time.monotonic() - origin)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        running = {}
+        while waiting or running:
+            for stage in list(waiting):
+                if any(dep in failures for dep in stage.deps):
+                    failures[stage.name] = RuntimeError("pominięty z powodu błędu zależności")
+                    waiting.remove(stage)
+                elif all(dep in results for dep in stage.deps):
+                    running[executor.submit(in_context(run), stage)] = stage
+                    waiting.remove(stage)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception as e:
+                    failures[stage.name] = e
+                    print(f"Etap {stage.name} zakończył się błędem: {e}", flush=True)
+
+    if failures:
+        raise StageError(failures, results, timings)
+    return results, timings
+
+
+def format_timings(timings):
+    """Raport czasów etapów: start, koniec i czas trwania oraz całkowity czas potoku."""
+    lines = ["Czasy etapów (s):"]
+    for name, (started, finished) in sorted(timings.items(), key=lambda item: item[1][0]):
+        lines.append(f"  {name:<22} {started:8.2f} -> {finished:8.2f}  ({finished - started:.2f})")
+    total = max((finished for _, finished in timings.values()), default=0.0)
+    lines.append(f"  {'razem':<22} {total:8.2f}")
+    return "\n".join(lines)
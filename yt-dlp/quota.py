@@ -0,0 +1,112 @@
+"""
+Planowanie zużycia limitu YouTube Data API.
+
+Dzienny limit (domyślnie 10 000 jednostek) odnawia się o północy czasu
+pacyficznego. Zużycie jest zapisywane w lokalnym pliku, aby kolejne
+uruchomienia tego samego dnia widziały, ile jednostek zostało.
+"""
+
+import json
+import os
+import threading
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Koszt wywołań w jednostkach limitu (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {
+    "captions.list": 50,
+    "captions.insert": 400,
+    "captions.update": 450,
+    "captions.delete": 50,
+    "videos.list": 1,
+    "videos.update": 50,
+}
+
+DEFAULT_DAILY_QUOTA = 10000
+DEFAULT_LEDGER_FILE = "quota_ledger.json"
+DEFAULT_DEFERRED_FILE = "quota_deferred.txt"
+
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+class QuotaExceeded(Exception):
+    """Dzisiejszy limit YouTube Data API nie wystarczy na zaplanowane wywołania."""
+
+
+def estimate_video_cost(caption_count, localized=True):
+    """
+    Górne oszacowanie kosztu publikacji jednego filmu: lista napisów,
+    aktualizacja każdej ścieżki (najdroższy wariant) oraz jeden odczyt
+    i zapis lokalizacji.
+    """
+    cost = QUOTA_COSTS["captions.list"] + QUOTA_COSTS["captions.update"] * caption_count
+    if localized:
+        cost += QUOTA_COSTS["videos.list"] + QUOTA_COSTS["videos.update"]
+    return cost
+
+
+class QuotaPlanner:
+    def __init__(self, ledger_file=DEFAULT_LEDGER_FILE, daily_limit=DEFAULT_DAILY_QUOTA,
+                 deferred_file=DEFAULT_DEFERRED_FILE):
+        self.ledger_file = ledger_file
+        self.daily_limit = daily_limit
+        self.deferred_file = deferred_file
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def today():
+        return datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+    def _load(self):
+        if not os.path.exists(self.ledger_file):
+            return {}
+        with open(self.ledger_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, ledger):
+        # Zachowujemy tylko ostatni tydzień wpisów
+        ledger = dict(sorted(ledger.items())[-7:])
+        temp_file = f"{self.ledger_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(ledger, f, indent=2)
+        os.replace(temp_file, self.ledger_file)
+
+    def used_today(self):
+        with self._lock:
+            return self._load().get(self.today(), 0)
+
+    def remaining(self):
+        return max(0, self.daily_limit - self.used_today())
+
+    def reserve(self, units):
+        """Rezerwacja `units` jednostek; zwraca False, jeśli dzisiejszy limit by nie wystarczył."""
+        with self._lock:
+            ledger = self._load()
+            day = self.today()
+            if ledger.get(day, 0) + units > self.daily_limit:
+                return False
+            ledger[day] = ledger.get(day, 0) + units
+            self._save(ledger)
+            return True
+
+    def require(self, units, url=None):
+        """Jak reserve(), ale przy braku limitu zapisuje URL do odroczenia i zgłasza QuotaExceeded."""
+        if self.reserve(units):
+            return
+        if url:
+            self.defer(url)
+        raise QuotaExceeded(
+            f"Potrzeba {units} jednostek limitu YouTube, a dziś zostało {self.remaining()}. "
+            f"Film odłożono do pliku {self.deferred_file} - uruchom go ponownie jutro (--batch {self.deferred_file})."
+        )
+
+    def defer(self, url):
+        with self._lock:
+            deferred = []
+            if os.path.exists(self.deferred_file):
+                with open(self.deferred_file, "r", encoding="utf-8") as f:
+                    deferred = [line.strip() for line in f if line.strip()]
+            if url not in deferred:
+                with open(self.deferred_file, "a", encoding="utf-8") as f:
+                    f.write(url + "\n")
@@ -0,0 +1,205 @@
+"""
+Narzędzia do pracy z plikami SRT: parsowanie na napisy (cue), składanie
+z powrotem do tekstu, dzielenie na fragmenty według budżetu tokenów,
+sprawdzanie tłumaczenia napis po napisie względem źródła oraz porównanie
+dwóch wersji pliku na poziomie napisów.
+"""
+
+import difflib
+import re
+from collections import namedtuple
+
+Cue = namedtuple("Cue", ["index", "start", "end", "text"])
+
+TIMING_RE = re.compile(
+    r"^\s*(\d{1,2}:\d{2}:\d{2}[,.]\d{1,3})\s*-->\s*(\d{1,2}:\d{2}:\d{2}[,.]\d{1,3})"
+)
+CODE_FENCE_RE = re.compile(r"^[ \t]*```[\w-]*[ \t]*$", re.MULTILINE)
+BLANK_LINES_RE = re.compile(r"\n[ \t]*(?:\n[ \t]*)+")
+
+# Tłumaczenie wielokrotnie dłuższe od źródła zwykle oznacza sklejone napisy
+MAX_LENGTH_RATIO = 3
+
+
+def timestamp_to_ms(timestamp):
+    """Zamiana znacznika czasu SRT (HH:MM:SS,mmm) na milisekundy."""
+    hms, ms = re.split(r"[,.]", timestamp.strip())
+    hours, minutes, seconds = (int(part) for part in hms.split(":"))
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + int(ms.ljust(3, "0"))
+
+
+def ms_to_timestamp(ms):
+    """Zamiana milisekund na znacznik czasu SRT (HH:MM:SS,mmm)."""
+    ms = max(0, int(round(ms)))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def parse_srt(content):
+    """
+    Parsowanie treści SRT na listę obiektów Cue.
+    Ignoruje znacznik BOM, znaczniki kodu (```) oraz puste bloki.
+    """
+    content = content.replace("﻿", "").replace("\r\n", "\n").replace("\r", "\n")
+    content = CODE_FENCE_RE.sub("", content)
+
+    cues = []
+    for block in BLANK_LINES_RE.split(content):
+        lines = [line for line in block.split("\n") if line.strip()]
+        if lines:
+            cue = _parse_block(lines)
+            if cue is not None:
+                cues.append(cue)
+    return cues
+
+
+def _parse_block(block):
+    for position, line in enumerate(block):
+        match = TIMING_RE.match(line)
+        if not match:
+            continue
+        index = None
+        if position > 0 and block[position - 1].strip().isdigit():
+            index = int(block[position - 1].strip())
+        text = "\n".join(part.strip() for part in block[position + 1:])
+        return Cue(index, match.group(1).replace(".", ","), match.group(2).replace(".", ","), text)
+    return None
+
+
+def format_srt(cues):
+    """Składanie listy Cue z powrotem do tekstu SRT."""
+    blocks = []
+    for number, cue in enumerate(cues, start=1):
+        index = cue.index if cue.index is not None else number
+        blocks.append(f"{index}\n{cue.start} --> {cue.end}\n{cue.text}")
+    return "\n\n".join(blocks) + "\n"
+
+
+def estimate_tokens(text):
+    """Przybliżona liczba tokenów (ok. 3 znaki na token dla tekstów wielojęzycznych)."""
+    return len(text) // 3 + 1
+
+
+def chunk_cues(cues, max_tokens=1500):
+    """
+    Dzielenie listy napisów na fragmenty, z których każdy mieści się
+    w budżecie `max_tokens`. Pojedynczy napis nigdy nie jest dzielony.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for cue in cues:
+        cue_tokens = estimate_tokens(format_srt([cue]))
+        if current and current_tokens + cue_tokens > max_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(cue)
+        current_tokens += cue_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def merge_translation(source_cues, translated_cues):
+    """
+    Przeniesienie przetłumaczonych tekstów na oryginalne napisy.
+    Numery i znaczniki czasu zawsze pochodzą ze źródła.
+    """
+    if len(source_cues) != len(translated_cues):
+        raise ValueError(
+            f"Liczba napisów w tłumaczeniu ({len(translated_cues)}) "
+            f"nie zgadza się ze źródłem ({len(source_cues)})."
+        )
+    return [source._replace(text=translated.text) for source, translated in zip(source_cues, translated_cues)]
+
+
+def validate_translation(source_cues, translated_cues):
+    """
+    Porównanie tłumaczenia ze źródłem napis po napisie. Napisy tłumaczenia są
+    dopasowywane po numerze (napisy bez numeru - po pozycji, jak w format_srt).
+    Zwraca (teksty, problemy): teksty[i] to przetłumaczony tekst i-tego napisu
+    źródła albo None, a problemy to {pozycja: opis} dla napisów brakujących,
+    ze zmienionym czasem, pustych lub sklejonych z sąsiednimi.
+    """
+    if len(translated_cues) == len(source_cues) and any(cue.index is None for cue in translated_cues):
+        candidates = list(translated_cues)
+    else:
+        by_index = {}
+        for number, cue in enumerate(translated_cues, start=1):
+            by_index.setdefault(cue.index if cue.index is not None else number, cue)
+        candidates = [by_index.get(source.index if source.index is not None else number)
+                      for number, source in enumerate(source_cues, start=1)]
+
+    texts, problems = [], {}
+    for position, (source, cue) in enumerate(zip(source_cues, candidates)):
+        if cue is None:
+            problem = "brak napisu"
+        elif (cue.start, cue.end) != (source.start, source.end):
+            problem = "zmieniony czas"
+        elif not cue.text.strip():
+            problem = "pusty tekst"
+        elif any(TIMING_RE.match(line) for line in cue.text.split("\n")):
+            problem = "sklejone napisy"
+        elif len(cue.text) > MAX_LENGTH_RATIO * len(source.text) + 40:
+            problem = "tekst zbyt długi (sklejone napisy?)"
+        else:
+            problem = None
+
+        if problem is None:
+            texts.append(cue.text)
+        else:
+            texts.append(None)
+            problems[position] = problem
+    return texts, problems
+
+
+def match_cues(old_cues, new_cues):
+    """
+    Dopasowanie napisów nowej wersji pliku do poprzedniej po tekście (difflib).
+    Zwraca listę: dla każdego nowego napisu pozycję napisu o tym samym tekście
+    w poprzedniej wersji albo None (napis dodany lub zmieniony). Zmiana samych
+    czasów nie psuje dopasowania.
+    """
+    matcher = difflib.SequenceMatcher(None, [cue.text for cue in old_cues], [cue.text for cue in new_cues],
+                                      autojunk=False)
+    mapping = [None] * len(new_cues)
+    for tag, old_start, old_end, new_start, _ in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(old_end - old_start):
+                mapping[new_start + offset] = old_start + offset
+    return mapping
+
+
+def context_windows(positions, total, context=2):
+    """
+    Zgrupowanie pozycji napisów w przedziały (początek, koniec) poszerzone
+    o `context` sąsiednich napisów z każdej strony; nakładające się przedziały
+    są łączone.
+    """
+    windows = []
+    for position in sorted(positions):
+        start, end = max(0, position - context), min(total, position + context + 1)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def shift_cues(cues, offset_ms):
+    """Przesunięcie wszystkich znaczników czasu o `offset_ms` milisekund."""
+    return [
+        cue._replace(
+            start=ms_to_timestamp(timestamp_to_ms(cue.start) + offset_ms),
+            end=ms_to_timestamp(timestamp_to_ms(cue.end) + offset_ms),
+        )
+        for cue in cues
+    ]
+
+
+def renumber_cues(cues):
+    """Nadanie napisom kolejnych numerów od 1."""
+    return [cue._replace(index=number) for number, cue in enumerate(cues, start=1)]
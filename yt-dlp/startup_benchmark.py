@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Pomiar czasu uruchomienia skryptów (import modułu i wywołanie --help)
+w osobnych procesach Pythona, z profilem importów (python -X importtime).
+Sprawdza też, czy po samym imporcie nie zostały wczytane ciężkie biblioteki
+(yt_dlp, openai, googleapiclient, google_auth_oauthlib). Kończy się kodem 1,
+gdy któryś pomiar przekracza budżet - można go wpiąć w cron lub CI.
+
+Przykład:
+    python startup_benchmark.py --budget-ms 300 --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BLOGSPOT = os.path.join(os.path.dirname(HERE), "blogspot")
+
+HEAVY_MODULES = ["yt_dlp", "openai", "googleapiclient", "google_auth_oauthlib"]
+
+# (nazwa, katalog, moduł, skrypt)
+ENTRY_POINTS = [
+    ("yt_caption_uploader", HERE, "yt_caption_uploader", "yt_caption_uploader.py"),
+    ("blogspot/post_draft", BLOGSPOT, "post_draft", "post_draft.py"),
+    ("blogspot/post_draft_eng", BLOGSPOT, "post_draft_eng", "post_draft_eng.py"),
+]
+
+
+def import_profile(directory, module, top=10):
+    """Łączny czas importu modułu (ms) i najwolniejsze importy według czasu włącznie z zależnościami."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=directory, capture_output=True, text=True, check=True
+    ).stderr
+
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        if name == "site":
+            # Wszystko do modułu site to start interpretera, a nie import mierzonego modułu
+            entries = []
+        elif self_us.isdigit():
+            entries.append((name, int(self_us), int(cumulative_us)))
+
+    total = next((cumulative for name, _, cumulative in entries if name == module), 0)
+    slowest = sorted((entry for entry in entries if entry[0] != module), key=lambda entry: -entry[2])[:top]
+    return total / 1000, [{"module": name, "self_ms": own / 1000, "cumulative_ms": cumulative / 1000}
+                          for name, own, cumulative in slowest]
+
+
+def loaded_heavy_modules(directory, module):
+    code = (f"import json, sys, {module}; "
+            f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output)
+
+
+def help_wall_time(directory, script, runs):
+    """Mediana czasu (ms) wywołania `python skrypt --help` od startu interpretera do zakończenia."""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, script, "--help"], cwd=directory, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pomiar czasu uruchomienia skryptów z budżetem.')
+    parser.add_argument('--budget-ms', type=float, default=300,
+                        help='Budżet czasu importu modułu i mediany --help (ms, domyślnie 300).')
+    parser.add_argument('--runs', type=int, default=5, help='Liczba powtórzeń --help (domyślnie 5).')
+    parser.add_argument('--output', default=None, help='Opcjonalny plik z wynikami JSON.')
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for name, directory, module, script in ENTRY_POINTS:
+        import_ms, slowest = import_profile(directory, module)
+        heavy = loaded_heavy_modules(directory, module)
+        help_ms = help_wall_time(directory, script, args.runs)
+        problems = []
+        if import_ms > args.budget_ms:
+            problems.append(f"import {import_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        if help_ms > args.budget_ms:
+            problems.append(f"--help {help_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        if heavy:
+            problems.append(f"wczytane przy imporcie: {', '.join(heavy)}")
+        failed = failed or bool(problems)
+
+        print(f"{name}: import {import_ms:.0f} ms, --help {help_ms:.0f} ms (mediana z {args.runs})"
+              + (f" - PRZEKROCZONO: {'; '.join(problems)}" if problems else " - OK"))
+        for entry in slowest[:5]:
+            print(f"    {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+        results.append({"entry_point": name, "import_ms": round(import_ms, 1), "help_ms": round(help_ms, 1),
+                        "heavy_modules": heavy, "slowest_imports": slowest, "problems": problems})
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "budget_ms": args.budget_ms, "results": results},
+                      f, indent=2, ensure_ascii=False)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Katalog roboczy jednego filmu (np. work/<video_id>/) z indeksem utworzonych
+plików w index.json. Kolejne kroki (publikacja napisów, wpis na bloga)
+odnajdują pliki po kluczu, np. "srt:en" albo "title:pl", zamiast
+przeszukiwać bieżący katalog.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+DEFAULT_WORK_DIR = "work"
+INDEX_FILE = "index.json"
+
+# Rodzaj pliku (część klucza przed ":") -> wspólny katalog przy eksporcie
+EXPORT_DIRS = {
+    "srt": "srt",
+    "title": "title",
+    "description": "description",
+    "audio": "audio",
+}
+
+
+def atomic_write_text(path, text):
+    """Zapis pliku przez plik tymczasowy i os.replace - czytelnik nigdy nie zobaczy połowy treści."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class Workspace:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    @classmethod
+    def for_video(cls, video_id, work_dir=DEFAULT_WORK_DIR):
+        return cls(os.path.join(work_dir, video_id))
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def add(self, key, path):
+        """Rejestracja istniejącego pliku z katalogu roboczego pod kluczem `key`."""
+        with self._lock:
+            self.index[key] = os.path.relpath(path, self.root)
+            atomic_write_text(self.index_path, json.dumps(self.index, indent=2, ensure_ascii=False))
+        return path
+
+    def write_text(self, key, name, text):
+        """Atomowy zapis pliku `name` w katalogu roboczym i rejestracja pod kluczem `key`."""
+        path = self.path(name)
+        atomic_write_text(path, text)
+        return self.add(key, path)
+
+    def get(self, key):
+        """Ścieżka pliku o kluczu `key` albo None, jeśli go nie ma."""
+        with self._lock:
+            name = self.index.get(key)
+        if name is None:
+            return None
+        path = self.path(name)
+        return path if os.path.exists(path) else None
+
+    def keys(self, kind):
+        """Klucze danego rodzaju, np. keys("srt") -> ["srt:pl", "srt:en", ...]."""
+        with self._lock:
+            return [key for key in self.index if key.split(":", 1)[0] == kind]
+
+    def export(self, dest_root="."):
+        """
+        Skopiowanie zarejestrowanych plików do wspólnych katalogów srt/, title/,
+        description/ i audio/ (dotychczasowy układ wyników). Pliki są dowiązywane,
+        a gdy się nie da - kopiowane; katalog roboczy pozostaje nienaruszony.
+        """
+        with self._lock:
+            items = list(self.index.items())
+        for key, name in items:
+            directory = EXPORT_DIRS.get(key.split(":", 1)[0])
+            source = self.path(name)
+            if directory is None or not os.path.exists(source):
+                continue
+            os.makedirs(os.path.join(dest_root, directory), exist_ok=True)
+            destination = os.path.join(dest_root, directory, os.path.basename(name))
+            temp_destination = destination + ".tmp"
+            try:
+                if os.path.exists(temp_destination):
+                    os.remove(temp_destination)
+                os.link(source, temp_destination)
+            except OSError:
+                shutil.copy2(source, temp_destination)
+            os.replace(temp_destination, destination)
@@ -0,0 +1,175 @@
+"""
+Wspólna warstwa wykonywania wywołań YouTube Data API: ponawianie błędów
+przejściowych (429, 5xx, zerwane połączenia) z wykładniczym opóźnieniem
+i losowym rozrzutem, respektowanie nagłówka Retry-After, przesyłanie
+plików w trybie wznawialnym (resumable) oraz statystyki czasu i ponowień
+dla każdego rodzaju wywołania. Dokument discovery API jest wczytywany raz
+na proces i przechowywany na dysku, więc kolejne klienty powstają bez
+ponownego pobierania i parsowania. googleapiclient jest importowany
+dopiero przy pierwszym użyciu, aby nie spowalniać przebiegów bez YouTube.
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+from metrics import record
+from workspace import atomic_write_text
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+DISCOVERY_CACHE_DIR = "discovery_cache"
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest"
+
+_discovery_documents = {}
+_discovery_lock = threading.Lock()
+
+
+class ApiStats:
+    """Liczba wywołań, ponowień i łączny czas dla każdej etykiety wywołania."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def record(self, label, seconds, retries):
+        with self._lock:
+            entry = self.calls.setdefault(label, {"calls": 0, "retries": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["retries"] += retries
+            entry["seconds"] += seconds
+
+    def summary(self):
+        with self._lock:
+            if not self.calls:
+                return "Brak wywołań YouTube API."
+            lines = ["Wywołania YouTube API:"]
+            for label, entry in sorted(self.calls.items()):
+                average = entry["seconds"] / entry["calls"]
+                lines.append(f"  {label:<20} {entry['calls']:4d} wyw.  {entry['retries']:3d} ponowień  "
+                             f"śr. {average:.2f} s  łącznie {entry['seconds']:.2f} s")
+            return "\n".join(lines)
+
+
+API_STATS = ApiStats()
+
+
+def discovery_document(api="youtube", version="v3", cache_dir=DISCOVERY_CACHE_DIR):
+    """
+    Dokument discovery API: z pamięci procesu, z pliku w `cache_dir`, z kopii
+    dołączonej do googleapiclient albo (ostatecznie) z sieci. Usunięcie pliku
+    z `cache_dir` wymusza ponowne wczytanie.
+    """
+    key = (api, version)
+    with _discovery_lock:
+        if key not in _discovery_documents:
+            path = os.path.join(cache_dir, f"{api}.{version}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+            else:
+                from googleapiclient.discovery_cache import get_static_doc
+
+                content = get_static_doc(api, version)
+                if content is None:
+                    import urllib.request
+
+                    with urllib.request.urlopen(DISCOVERY_URL.format(api=api, version=version), timeout=30) as response:
+                        content = response.read().decode("utf-8")
+                os.makedirs(cache_dir, exist_ok=True)
+                atomic_write_text(path, content)
+            _discovery_documents[key] = json.loads(content)
+        return _discovery_documents[key]
+
+
+def build_service(credentials, api="youtube", version="v3"):
+    """Nowy klient API z zapamiętanego dokumentu discovery (bez googleapiclient.discovery.build)."""
+    from googleapiclient.discovery import build_from_document
+
+    return build_from_document(discovery_document(api, version), credentials=credentials)
+
+
+def _retry_delay(attempt, error, base_delay, max_delay):
+    """Opóźnienie przed kolejną próbą: Retry-After z odpowiedzi albo wykładnicze z pełnym rozrzutem."""
+    from googleapiclient.errors import HttpError
+
+    if isinstance(error, HttpError):
+        retry_after = error.resp.get("retry-after")
+        if retry_after:
+            try:
+                return min(max_delay, float(retry_after))
+            except ValueError:
+                pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def _is_retryable(error):
+    from googleapiclient.errors import HttpError
+
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRY_STATUSES
+    return isinstance(error, (ConnectionError, socket.timeout, TimeoutError))
+
+
+def _with_retry(call, label, max_retries, base_delay, max_delay, stats, retry_log=None):
+    # `retry_log` (lista) dostaje liczbę ponowień tego wywołania - także gdy się nie udało
+    started = time.monotonic()
+    retries = 0
+    try:
+        while True:
+            try:
+                return call()
+            except Exception as e:
+                if retries >= max_retries or not _is_retryable(e):
+                    raise
+                delay = _retry_delay(retries, e, base_delay, max_delay)
+                retries += 1
+                print(f"{label}: błąd przejściowy ({e}), ponowienie {retries}/{max_retries} za {delay:.1f} s...",
+                      flush=True)
+                time.sleep(delay)
+    finally:
+        stats.record(label, time.monotonic() - started, retries)
+        record(youtube_calls=1, youtube_retries=retries)
+        if retry_log is not None:
+            retry_log.append(retries)
+
+
+def execute(request, label, max_retries=5, base_delay=1.0, max_delay=60.0, stats=API_STATS):
+    """Wykonanie zapytania googleapiclient (także BatchHttpRequest) z ponawianiem."""
+    return _with_retry(request.execute, label, max_retries, base_delay, max_delay, stats)
+
+
+def media_upload(path, mimetype="application/octet-stream"):
+    """Plik do przesłania w trybie wznawialnym, w kawałkach po UPLOAD_CHUNK_SIZE bajtów."""
+    from googleapiclient.http import MediaFileUpload
+
+    return MediaFileUpload(path, mimetype=mimetype, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+
+
+def execute_upload(request, label, max_retries=5, base_delay=1.0, max_delay=60.0, stats=API_STATS):
+    """
+    Wykonanie zapytania z plikiem przesyłanym w trybie wznawialnym: każdy kawałek
+    jest ponawiany osobno, a po błędzie przesyłanie wznawia się od ostatniego
+    potwierdzonego bajtu zamiast od początku.
+    """
+    chunk_retries = []
+
+    def upload():
+        response = None
+        while response is None:
+            _, response = _with_retry(request.next_chunk, f"{label} (kawałek)",
+                                      max_retries, base_delay, max_delay, stats, chunk_retries)
+        return response
+
+    started = time.monotonic()
+    try:
+        response = upload()
+        record(bytes_out=request.resumable.size())
+        return response
+    finally:
+        # Ponowienia całego przesyłania to suma ponowień jego kawałków
+        stats.record(label, time.monotonic() - started, sum(chunk_retries))
@@ -1,17 +1,34 @@
 #!/usr/bin/env python3
 
 import argparse
-import yt_dlp
 import re
 import os
 import shutil
 import pickle
-
-from openai import OpenAI
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+import json
+import signal
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from srt_tools import (parse_srt, format_srt, chunk_cues, merge_translation, validate_translation,
+                       match_cues, context_windows)
+from translation_cache import TranslationCache, DEFAULT_CACHE_PATH
+from pipeline import Stage, StageError, run_stages, format_timings
+from quota import QUOTA_COSTS, QuotaPlanner, QuotaExceeded, estimate_video_cost, DEFAULT_DAILY_QUOTA
+from job_manifest import JobManifest, DEFAULT_MANIFEST_DIR, file_sha256, text_sha256
+from youtube_api import API_STATS, execute, execute_upload, media_upload, build_service
+from openai_limiter import RateLimitedClient, DEFAULT_RPM, DEFAULT_TPM
+from job_queue import JobQueue, DEFAULT_QUEUE_PATH, DONE, FAILED, DEFERRED
+from workspace import Workspace, DEFAULT_WORK_DIR, atomic_write_text
+from metrics import METRICS, SamplingProfiler, in_context, record
+from openai_batch import BatchSubmission, message_text, DEFAULT_POLL_SECONDS as DEFAULT_BATCH_POLL_SECONDS
+from audio_tools import transcribe_file, transcribe_segmented, needs_segmenting, preprocess_audio, remap_cues
+
+# Ciężkie biblioteki (yt_dlp, openai, googleapiclient, google_auth_oauthlib) są importowane
+# dopiero w funkcjach, które ich używają - --help, --enqueue i przebiegi bez --upload
+# nie płacą za ich wczytanie (zob. startup_benchmark.py)
 
 def download_hook(d):
     if d['status'] == 'downloading':
@@ -34,140 +51,564 @@ LANG_MAP = {
     'ru': 'Rosyjski'
 }
 
-def translate_srt(file_path, target_langs, client):
-    """Tłumaczenie pliku SRT na wybrane języki."""
-    for target_lang in target_langs:
-        if target_lang not in LANG_MAP:
-            print(f"Nieobsługiwany język: {target_lang}")
-            continue
+# Modele i wersje promptów - zmiana wersji unieważnia wpisy w cache tłumaczeń
+SRT_MODEL = "gpt-4o"
+SRT_PROMPT_VERSION = "srt-1"
+TEXT_MODEL = "gpt-4o-mini"
+TEXT_PROMPT_VERSION = "text-1"
+METADATA_PROMPT_VERSION = "metadata-1"
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            srt_content = f.read()
+URL_RE = re.compile(r"https?://\S+|www\.\S+")
 
-        print(f"Tłumaczenie pliku {file_path} na język {LANG_MAP[target_lang]}...")
+def srt_translation_messages(srt_content, target_lang):
+    """Zapytanie o tłumaczenie treści SRT na jeden język (wspólne dla zapytań zwykłych i Batch API)."""
+    prompt = (
+        f"Przetłumacz poniższy plik SRT na język {LANG_MAP[target_lang]}. "
+        f"Proszę odpowiedzieć bez dodawania wstępu, komentarza ani dodatkowych oznaczeń. "
+        f"Odpowiedź powinna zawierać wyłącznie tłumaczenie w tym samym formacie, co oryginał. "
+        f"Nie dodawaj żadnych znaczników kodu, takich jak ``` lub innych formatów. "
+        f"Odpowiedź powinna zawierać wyłącznie tłumaczenie w formacie SRT.\n\n"
+        f"Oto treść:\n\n{srt_content}"
+    )
+    return [{"role": "user", "content": prompt}]
 
-        prompt = (
-            f"Przetłumacz poniższy plik SRT na język {LANG_MAP[target_lang]}. "
-            f"Proszę odpowiedzieć bez dodawania wstępu, komentarza ani dodatkowych oznaczeń. "
-            f"Odpowiedź powinna zawierać wyłącznie tłumaczenie w tym samym formacie, co oryginał. "
-            f"Nie dodawaj żadnych znaczników kodu, takich jak ``` lub innych formatów. "
-            f"Odpowiedź powinna zawierać wyłącznie tłumaczenie w formacie SRT.\n\n"
-            f"Oto treść:\n\n{srt_content}"
-        )
+def translate_srt_content(srt_content, target_lang, client):
+    """Tłumaczenie treści SRT (już wczytanej) na jeden język."""
+    response = client.chat.completions.create(
+        model=SRT_MODEL,
+        messages=srt_translation_messages(srt_content, target_lang)
+    )
+    return response.choices[0].message.content
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        translated_text = response.choices[0].message.content
+def repair_srt_translation(chunk, target_lang, client, translated_text, attempts=2):
+    """
+    Sprawdzenie odpowiedzi `translated_text` napis po napisie (validate_translation);
+    brakujące lub uszkodzone napisy są wysyłane ponownie same (do `attempts` razy)
+    i wstawiane na swoje miejsca. Zwraca poprawiony fragment w formacie SRT.
+    """
+    texts, problems = validate_translation(chunk, parse_srt(translated_text))
+    for attempt in range(1, attempts + 1):
+        if not problems:
+            break
+        broken = sorted(problems)
+        print(f"Naprawa {len(broken)}/{len(chunk)} napisów ({LANG_MAP[target_lang]}): "
+              f"{', '.join(sorted(set(problems.values())))}...", flush=True)
+        broken_cues = [chunk[position] for position in broken]
+        repaired, still_broken = validate_translation(
+            broken_cues, parse_srt(translate_srt_content(format_srt(broken_cues), target_lang, client)))
+        record(repaired_cues=len(broken) - len(still_broken))
+        problems = {}
+        for number, position in enumerate(broken):
+            if number in still_broken:
+                problems[position] = still_broken[number]
+            else:
+                texts[position] = repaired[number]
+    if problems:
+        raise ValueError(f"Nie udało się naprawić {len(problems)} napisów: "
+                         f"{', '.join(sorted(set(problems.values())))}.")
+    return format_srt([cue._replace(text=text) for cue, text in zip(chunk, texts)])
+
+def translate_srt_chunk(chunk, target_lang, client, attempts=2, cache=None):
+    """
+    Tłumaczenie jednego fragmentu napisów. Brakujące lub uszkodzone napisy
+    odpowiedzi są tłumaczone ponownie same (repair_srt_translation), zamiast
+    tłumaczyć cały fragment od nowa. Numery i znaczniki czasu zawsze
+    pochodzą z oryginału. Jeśli podano `cache`, poprawne tłumaczenia
+    fragmentów są w nim zapamiętywane.
+    """
+    source_text = format_srt(chunk)
 
-        translated_file_path = f"{os.path.splitext(file_path)[0]}.{target_lang}.srt"
-        with open(translated_file_path, "w", encoding="utf-8") as f:
-            f.write(translated_text)
+    def translate():
+        return repair_srt_translation(chunk, target_lang, client,
+                                      translate_srt_content(source_text, target_lang, client), attempts)
 
-        print(f"Przetłumaczony plik zapisany jako: {translated_file_path}")
+    if cache is None:
+        translated_text = translate()
+    else:
+        translated_text = cache.get_or_translate(source_text, target_lang, SRT_MODEL, SRT_PROMPT_VERSION, translate)
+    return merge_translation(chunk, parse_srt(translated_text))
 
-def translate_text_ignoring_urls(text, target_lang, client):
+def translate_srt_chunks_batch(chunks, client, cache=None, jobs=4, poll_seconds=DEFAULT_BATCH_POLL_SECONDS,
+                               state_path=None, attempts=2):
+    """
+    Tłumaczenie wielu fragmentów napisów (lista par (fragment, język)) jednym
+    zleceniem OpenAI Batch API - taniej, ale z wynikiem w ciągu do 24 godzin.
+    Fragmenty z `cache` nie są wysyłane. Odpowiedzi są sprawdzane jak przy
+    zwykłych zapytaniach, a uszkodzone napisy naprawiane zwykłymi zapytaniami
+    (maksymalnie `jobs` naraz). Zwraca listę: przetłumaczone napisy albo
+    wyjątek dla każdego fragmentu.
+    """
+    # Batch API nie podlega limitom zapytań na minutę - idzie bezpośrednio do klienta openai.
+    # Klient ma max_retries=0 (ponawia RateLimitedClient), więc tutaj przejściowe błędy
+    # (5xx, zerwane połączenie) przy wysyłaniu i odpytywaniu zlecenia ponawia sama biblioteka.
+    submission = BatchSubmission(getattr(client, "client", client).with_options(max_retries=5))
+    results = [None] * len(chunks)
+    for number, (chunk, lang) in enumerate(chunks):
+        source_text = format_srt(chunk)
+        cached = cache.get(cache.make_key(source_text, lang, SRT_MODEL, SRT_PROMPT_VERSION)) if cache else None
+        if cached is not None:
+            results[number] = merge_translation(chunk, parse_srt(cached))
+        else:
+            submission.add(number, model=SRT_MODEL, messages=srt_translation_messages(source_text, lang))
+    if not len(submission):
+        return results
+
+    print(f"Wysyłanie {len(submission)} fragmentów napisów do Batch API...", flush=True)
+    responses = submission.run(poll_seconds, state_path=state_path)
+
+    def finish(number, response):
+        chunk, lang = chunks[number]
+        usage = response.get("usage") or {}
+        record(model=SRT_MODEL, openai_calls=1, tokens_in=usage.get("prompt_tokens", 0),
+               tokens_out=usage.get("completion_tokens", 0))
+        translated_text = repair_srt_translation(chunk, lang, client, message_text(response), attempts)
+        if cache is not None:
+            cache.set(cache.make_key(format_srt(chunk), lang, SRT_MODEL, SRT_PROMPT_VERSION), translated_text)
+        return merge_translation(chunk, parse_srt(translated_text))
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {}
+        for custom_id, response in responses.items():
+            if isinstance(response, Exception):
+                results[int(custom_id)] = response
+            else:
+                futures[executor.submit(in_context(finish), int(custom_id), response)] = int(custom_id)
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+    return results
+
+def translate_srt(file_path, target_langs, client, jobs=4, chunk_tokens=1500, cache=None,
+                  previous=None, context_cues=2, batch_api=False, poll_seconds=DEFAULT_BATCH_POLL_SECONDS):
+    """
+    Tłumaczenie pliku SRT na wybrane języki.
+    Plik źródłowy jest czytany raz i dzielony na fragmenty po pełnych napisach
+    (budżet `chunk_tokens`). Wszystkie fragmenty wszystkich języków są tłumaczone
+    równolegle (maksymalnie `jobs` zapytań naraz). Każdy plik `.{lang}.srt` jest
+    zapisywany od razu po przetłumaczeniu wszystkich jego fragmentów.
+    Fragmenty przetłumaczone wcześniej są brane z `cache` (jeśli podano).
+
+    Tryb przyrostowy: `previous` to {język: ścieżka do wersji źródła, z której
+    powstał istniejący plik `.{lang}.srt`}. Dla takich języków tłumaczone są
+    tylko napisy dodane lub zmienione (razem z `context_cues` sąsiednimi
+    napisami jako kontekstem), a pozostałe teksty są przenoszone z istniejącego
+    tłumaczenia z czasami z nowej wersji źródła.
+
+    Z `batch_api` fragmenty wszystkich języków są wysyłane jednym zleceniem
+    Batch API (translate_srt_chunks_batch) i pliki są zapisywane po jego
+    zakończeniu. Identyfikatory wysłanego zlecenia są zapisywane w pliku
+    `.batch.json` obok źródła, więc przerwane oczekiwanie można wznowić.
+    Zwraca słownik {język: wyjątek} z błędami dla poszczególnych języków.
+    """
+    langs = []
+    for target_lang in target_langs:
+        if target_lang not in LANG_MAP:
+            print(f"Nieobsługiwany język: {target_lang}")
+            continue
+        if target_lang not in langs:
+            langs.append(target_lang)
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        cues = parse_srt(f.read())
+
+    failures = {}
+    if not langs or not cues:
+        return failures
+
+    def output_path(lang):
+        return f"{os.path.splitext(file_path)[0]}.{lang}.srt"
+
+    # Dla każdego języka: teksty przeniesione z poprzedniego tłumaczenia i fragmenty
+    # do przetłumaczenia jako listy pozycji napisów
+    texts, work = {}, {}
+    full_chunks = None
+    for lang in langs:
+        reused = _reuse_previous_translation(cues, (previous or {}).get(lang), output_path(lang))
+        if reused is None:
+            if full_chunks is None:
+                full_chunks, position = [], 0
+                for chunk in chunk_cues(cues, chunk_tokens):
+                    full_chunks.append(list(range(position, position + len(chunk))))
+                    position += len(chunk)
+            texts[lang] = [None] * len(cues)
+            work[lang] = full_chunks
+            print(f"Tłumaczenie pliku {file_path} na język {LANG_MAP[lang]} "
+                  f"({len(full_chunks)} fragm.)...", flush=True)
+            continue
+
+        texts[lang] = reused
+        changed = [position for position, text in enumerate(reused) if text is None]
+        work[lang] = []
+        for start, end in context_windows(changed, len(cues), context_cues):
+            offset = start
+            for chunk in chunk_cues(cues[start:end], chunk_tokens):
+                work[lang].append(list(range(offset, offset + len(chunk))))
+                offset += len(chunk)
+        print(f"Tłumaczenie przyrostowe na język {LANG_MAP[lang]}: {len(changed)} zmienionych "
+              f"z {len(cues)} napisów ({len(work[lang])} fragm.).", flush=True)
+
+    def finish(lang):
+        translated_cues = [cue._replace(text=text) for cue, text in zip(cues, texts[lang])]
+        atomic_write_text(output_path(lang), format_srt(translated_cues))
+        print(f"Przetłumaczony plik zapisany jako: {output_path(lang)}", flush=True)
+
+    pending = {lang: len(work[lang]) for lang in langs}
+    for lang in langs:
+        if not pending[lang]:
+            finish(lang)
+
+    def completed(lang, positions, translated):
+        if lang in failures:
+            return
+        if isinstance(translated, Exception):
+            failures[lang] = translated
+            print(f"Błąd tłumaczenia na język {LANG_MAP[lang]}: {translated}", flush=True)
+            return
+
+        # Napisy kontekstowe mają już tekst z poprzedniego tłumaczenia - zostaje bez zmian
+        for position, cue in zip(positions, translated):
+            if texts[lang][position] is None:
+                texts[lang][position] = cue.text
+
+        pending[lang] -= 1
+        if not pending[lang]:
+            finish(lang)
+
+    items = [(lang, positions) for lang in langs for positions in work[lang]]
+    if batch_api:
+        results = translate_srt_chunks_batch(
+            [([cues[position] for position in positions], lang) for lang, positions in items], client,
+            cache=cache, jobs=jobs, poll_seconds=poll_seconds,
+            state_path=f"{os.path.splitext(file_path)[0]}.batch.json")
+        for (lang, positions), translated in zip(items, results):
+            completed(lang, positions, translated)
+        return failures
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {}
+        for lang, positions in items:
+            chunk = [cues[position] for position in positions]
+            future = executor.submit(in_context(translate_srt_chunk), chunk, lang, client, cache=cache)
+            futures[future] = (lang, positions)
+
+        for future in as_completed(futures):
+            lang, positions = futures[future]
+            try:
+                translated = future.result()
+            except Exception as e:
+                translated = e
+            completed(lang, positions, translated)
+
+    return failures
+
+def _reuse_previous_translation(cues, previous_source, translated_file):
+    """
+    Teksty istniejącego tłumaczenia przeniesione na napisy nowej wersji źródła
+    (None dla napisów dodanych lub zmienionych) albo None, gdy tłumaczenia
+    przyrostowego nie da się wykonać i trzeba przetłumaczyć cały plik.
+    """
+    if not previous_source or not os.path.exists(previous_source) or not os.path.exists(translated_file):
+        return None
+    with open(previous_source, "r", encoding="utf-8") as f:
+        old_cues = parse_srt(f.read())
+    with open(translated_file, "r", encoding="utf-8") as f:
+        old_translated = parse_srt(f.read())
+    # Istniejące tłumaczenie musi odpowiadać zapisanej wersji źródła napis w napis
+    old_texts, problems = validate_translation(old_cues, old_translated)
+    if not old_cues or problems:
+        return None
+    return [None if old is None else old_texts[old] for old in match_cues(old_cues, cues)]
+
+def translate_text_ignoring_urls(text, target_lang, client, cache=None):
     """Tłumaczenie zwykłego tekstu z pominięciem adresów URL."""
     if target_lang not in LANG_MAP:
         print(f"Nieobsługiwany język: {target_lang}")
         return text
 
+    def translate():
+        prompt = (
+            f"Przetłumacz poniższy tekst na język {LANG_MAP[target_lang]}, "
+            "ale nie tłumacz żadnych adresów URL (zostaw je niezmienione). Tekst:\n\n"
+            f"{text}"
+        )
+        response = client.chat.completions.create(
+            model=TEXT_MODEL,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content
+
+    if cache is None:
+        return translate()
+    return cache.get_or_translate(text, target_lang, TEXT_MODEL, TEXT_PROMPT_VERSION, translate)
+
+def protect_urls(text):
+    """Zamiana adresów URL na znaczniki [[URL0]], [[URL1]], ... Zwraca (tekst, lista URL)."""
+    urls = []
+
+    def placeholder(match):
+        urls.append(match.group(0))
+        return f"[[URL{len(urls) - 1}]]"
+
+    return URL_RE.sub(placeholder, text), urls
+
+def restore_urls(text, urls):
+    """Przywrócenie adresów URL; wszystkie znaczniki muszą wystąpić w tekście."""
+    for number, url in enumerate(urls):
+        marker = f"[[URL{number}]]"
+        if marker not in text:
+            raise ValueError(f"Brak znacznika {marker} w tłumaczeniu.")
+        text = text.replace(marker, url)
+    return text
+
+def _request_metadata_translation(title, description, langs, client):
+    """Jedno zapytanie o tytuł i opis dla kilku języków naraz (odpowiedź w JSON)."""
+    lang_list = ", ".join(f"{lang} ({LANG_MAP[lang]})" for lang in langs)
     prompt = (
-        f"Przetłumacz poniższy tekst na język {LANG_MAP[target_lang]}, "
-        "ale nie tłumacz żadnych adresów URL (zostaw je niezmienione). Tekst:\n\n"
-        f"{text}"
+        f"Przetłumacz tytuł i opis filmu na języki: {lang_list}. "
+        "Znaczniki w postaci [[URL0]], [[URL1]] itd. pozostaw dokładnie bez zmian. "
+        "Odpowiedz wyłącznie obiektem JSON, w którym kluczami są kody języków, "
+        'a wartościami obiekty {"title": "...", "description": "..."}.\n\n'
+        + json.dumps({"title": title, "description": description}, ensure_ascii=False)
     )
     response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
+        model=TEXT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"}
     )
-    return response.choices[0].message.content
+    return json.loads(response.choices[0].message.content)
+
+def localize_metadata(title, description, target_langs, client, cache=None, langs_per_request=5):
+    """
+    Tłumaczenie tytułu i opisu na wiele języków jednym zapytaniem
+    (do `langs_per_request` języków na zapytanie) ze strukturalną odpowiedzią JSON.
+    Adresy URL są chronione znacznikami. Języki z niepoprawną odpowiedzią
+    są tłumaczone osobno przez translate_text_ignoring_urls.
+    Zwraca słownik {język: {"title": ..., "description": ...}}.
+    """
+    protected_title, title_urls = protect_urls(title)
+    protected_description, description_urls = protect_urls(description)
+    source_key = json.dumps([title, description], ensure_ascii=False)
+
+    results = {}
+    missing = []
+    for lang in target_langs:
+        if lang not in LANG_MAP:
+            print(f"Nieobsługiwany język: {lang}")
+            continue
+        cached = None
+        if cache is not None:
+            cached = cache.get(cache.make_key(source_key, lang, TEXT_MODEL, METADATA_PROMPT_VERSION))
+        if cached is not None:
+            results[lang] = json.loads(cached)
+        elif lang not in missing:
+            missing.append(lang)
+
+    for start in range(0, len(missing), max(1, langs_per_request)):
+        batch = missing[start:start + max(1, langs_per_request)]
+        print(f"Tłumaczenie tytułu i opisu na języki: {', '.join(batch)}...", flush=True)
+        try:
+            response = _request_metadata_translation(protected_title, protected_description, batch, client)
+        except Exception as e:
+            print(f"Błąd zbiorczego tłumaczenia tytułu i opisu: {e}", flush=True)
+            response = {}
+
+        for lang in batch:
+            try:
+                entry = response[lang]
+                localized = {
+                    "title": restore_urls(entry["title"], title_urls).strip(),
+                    "description": restore_urls(entry["description"], description_urls).strip(),
+                }
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                print(f"Niepoprawna odpowiedź dla języka {lang} ({e}), tłumaczenie osobno...", flush=True)
+                localized = {
+                    "title": translate_text_ignoring_urls(title, lang, client, cache=cache),
+                    "description": translate_text_ignoring_urls(description, lang, client, cache=cache),
+                }
+            else:
+                if cache is not None:
+                    cache.set(cache.make_key(source_key, lang, TEXT_MODEL, METADATA_PROMPT_VERSION),
+                              json.dumps(localized, ensure_ascii=False))
+            results[lang] = localized
+
+    return results
 
 def get_existing_captions(youtube, video_id):
-    response = youtube.captions().list(part="snippet", videoId=video_id).execute()
+    response = execute(youtube.captions().list(part="snippet", videoId=video_id), "captions.list")
     return response.get("items", [])
 
-def delete_caption(youtube, caption_id):
-    youtube.captions().delete(id=caption_id).execute()
-    print(f"Napisy o ID {caption_id} zostały usunięte.")
+CAPTION_STATE_FILE = "caption_sync.json"
+_caption_state_lock = threading.Lock()
 
-def upload_caption(youtube, video_id, language, caption_file):
-    """
-    Przesyłanie lub nadpisanie napisów w danym języku.
-    UWAGA: Najważniejsza zmiana polega na tym, że 'language' i 'name' są spójne,
-    aby uniknąć zdublowanych oznaczeń języka typu „Angielski–English”.
-    """
-    lang_name = LANG_MAP.get(language, language)
+def _load_caption_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    print(f"Przesyłanie napisów z pliku {caption_file} dla filmu {video_id} w języku {lang_name}...")
+def _save_caption_state(state_file, state):
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, state_file)
 
-    existing_captions = get_existing_captions(youtube, video_id)
+def plan_caption_sync(video_id, caption_files, existing_captions, state_file=CAPTION_STATE_FILE):
+    """
+    Ustalenie, co trzeba zrobić z napisami, bez wywoływania API.
+    `caption_files` to słownik {język: plik}, a `existing_captions` to wynik
+    jednego wywołania get_existing_captions. Dla każdego języka:
+      - treść bez zmian względem lokalnego zapisu (`state_file`) - "skip",
+      - ścieżka w tym języku już istnieje - "update" (aktualizacja w miejscu),
+      - brak ścieżki - "insert".
+    Zwraca (akcje, do_usunięcia), gdzie akcje to lista
+    (język, plik, akcja, id_napisów, skrót_treści), a do_usunięcia to lista
+    identyfikatorów zduplikowanych ścieżek.
+    """
+    with _caption_state_lock:
+        recorded = _load_caption_state(state_file).get(video_id, {})
 
-    # Sprawdź, czy istnieją napisy w danym języku i ewentualnie je usuń
+    tracks = {}
     for caption in existing_captions:
-        if caption["snippet"]["language"] == language:
-            print(f"Napisy w języku {language} ({lang_name}) już istnieją. Usuwanie...")
-            delete_caption(youtube, caption["id"])
-
-    # Ustawiamy w request_body spójne wartości dla 'language' i 'name'
-    request_body = {
-        "snippet": {
-            "videoId": video_id,
-            "language": language,  # np. 'en', 'pl'
-            "name": lang_name,     # np. 'Angielski', 'Polski' itp.
-            "isDraft": False,
-        }
-    }
+        if caption["snippet"].get("trackKind", "standard").lower() == "asr":
+            continue
+        tracks.setdefault(caption["snippet"]["language"], []).append(caption["id"])
+
+    actions = []
+    to_delete = []
+    for language, caption_file in caption_files.items():
+        content_hash = file_sha256(caption_file)
+        track_ids = tracks.get(language, [])
+        recorded_id = recorded.get(language, {}).get("caption_id")
+
+        if recorded.get(language, {}).get("sha256") == content_hash and recorded_id in track_ids:
+            action, keep_id = "skip", recorded_id
+        elif track_ids:
+            action = "update"
+            keep_id = recorded_id if recorded_id in track_ids else track_ids[0]
+        else:
+            action, keep_id = "insert", None
 
-    media = MediaFileUpload(caption_file, mimetype="application/octet-stream")
-    youtube.captions().insert(
-        part="snippet",
-        body=request_body,
-        media_body=media
-    ).execute()
+        actions.append((language, caption_file, action, keep_id, content_hash))
+        to_delete.extend(caption_id for caption_id in track_ids if caption_id != keep_id)
 
-    print(f"Napisy z pliku {caption_file} w języku {lang_name} ({language}) zostały przesłane pomyślnie.")
+    return actions, to_delete
 
-def update_video_localizations(youtube, video_id, language, translated_title, translated_description):
+def caption_sync_cost(actions, to_delete):
+    """Koszt planu synchronizacji napisów w jednostkach limitu YouTube Data API."""
+    cost = sum(QUOTA_COSTS[f"captions.{action}"] for _, _, action, _, _ in actions if action != "skip")
+    return cost + QUOTA_COSTS["captions.delete"] * len(to_delete)
+
+def sync_captions(youtube, video_id, actions, to_delete, state_file=CAPTION_STATE_FILE):
+    """
+    Wykonanie planu z plan_caption_sync: niezmienione napisy są pomijane,
+    zmienione aktualizowane w miejscu (captions.update), nowe dodawane
+    (captions.insert). Zbędne duplikaty ścieżek są usuwane jednym zapytaniem
+    wsadowym (przesyłanie plików nie jest obsługiwane w zapytaniach wsadowych Google API).
+    Zwraca słownik {język: "skip" | "update" | "insert"}.
     """
-    Dodaje (lub modyfikuje) lokalizacje (title, description) w wybranym języku.
+    statuses = {}
+    new_records = {}
+    for language, caption_file, action, keep_id, content_hash in actions:
+        lang_name = LANG_MAP.get(language, language)
+        statuses[language] = action
+
+        if action == "skip":
+            print(f"Napisy w języku {lang_name} ({language}) bez zmian - pomijanie.")
+        elif action == "update":
+            print(f"Aktualizacja napisów w języku {lang_name} ({language}) z pliku {caption_file}...")
+            execute_upload(youtube.captions().update(
+                part="snippet",
+                body={"id": keep_id, "snippet": {"isDraft": False}},
+                media_body=media_upload(caption_file)
+            ), "captions.update")
+        else:
+            print(f"Przesyłanie napisów z pliku {caption_file} w języku {lang_name} ({language})...")
+            response = execute_upload(youtube.captions().insert(
+                part="snippet",
+                body={
+                    "snippet": {
+                        "videoId": video_id,
+                        "language": language,
+                        "name": lang_name,
+                        "isDraft": False,
+                    }
+                },
+                media_body=media_upload(caption_file)
+            ), "captions.insert")
+            keep_id = response["id"]
+        new_records[language] = {"caption_id": keep_id, "sha256": content_hash}
+
+    if to_delete:
+        delete_errors = {}
+
+        def on_delete(request_id, _, error):
+            if error is not None:
+                delete_errors[request_id] = error
+
+        batch = youtube.new_batch_http_request(callback=on_delete)
+        for caption_id in to_delete:
+            batch.add(youtube.captions().delete(id=caption_id), request_id=caption_id)
+        execute(batch, "captions.delete (batch)")
+        for caption_id, error in delete_errors.items():
+            print(f"Nie udało się usunąć napisów o ID {caption_id}: {error}")
+        print(f"Usunięto zduplikowane napisy: {', '.join(c for c in to_delete if c not in delete_errors)}.")
+
+    with _caption_state_lock:
+        state = _load_caption_state(state_file)
+        state.setdefault(video_id, {}).update(new_records)
+        _save_caption_state(state_file, state)
+
+    return statuses
+
+def update_video_localizations(youtube, video_id, localizations):
     """
-    video_response = youtube.videos().list(
+    Dodaje (lub modyfikuje) lokalizacje (title, description) we wszystkich
+    językach naraz: jeden odczyt (videos.list) i co najwyżej jeden zapis (videos.update).
+    `localizations` to słownik {język: {"title": ..., "description": ...}}.
+    Zwraca liczbę wykonanych zapisów (0 lub 1).
+    """
+    video_response = execute(youtube.videos().list(
         part="snippet,localizations",
         id=video_id
-    ).execute()
+    ), "videos.list")
 
     if "items" not in video_response or not video_response["items"]:
         print("Nie znaleziono filmu o podanym ID.")
-        return
+        return 0
 
     video = video_response["items"][0]
+    current = video.get("localizations", {})
+    merged = dict(current)
+    for language, texts in localizations.items():
+        merged[language] = {"title": texts["title"], "description": texts["description"]}
 
-    if "snippet" not in video:
-        video["snippet"] = {}
+    if merged == current:
+        print("Lokalizacje tytułu i opisu są aktualne - pomijanie zapisu.")
+        return 0
+
+    body = {"id": video_id, "localizations": merged}
+    parts = "localizations"
 
     # Jeśli defaultLanguage nie jest ustawiony, ustawiamy go np. na 'pl'
-    if "defaultLanguage" not in video["snippet"]:
-        video["snippet"]["defaultLanguage"] = "pl"
+    # (wtedy trzeba wysłać także snippet, bo YouTube wymaga języka domyślnego)
+    snippet = video.get("snippet", {})
+    if "defaultLanguage" not in snippet:
+        snippet["defaultLanguage"] = "pl"
+        body["snippet"] = snippet
+        parts = "snippet,localizations"
 
-    if "localizations" not in video:
-        video["localizations"] = {}
+    execute(youtube.videos().update(part=parts, body=body), "videos.update")
 
-    # Dodajemy/modyfikujemy lokalizację dla podanego języka
-    video["localizations"][language] = {
-        "title": translated_title,
-        "description": translated_description
-    }
+    languages = ", ".join(f"{language} ({LANG_MAP.get(language, language)})" for language in localizations)
+    print(f"Zaktualizowano tytuł i opis w językach: {languages}.")
+    return 1
 
-    youtube.videos().update(
-        part="snippet,localizations",
-        body=video
-    ).execute()
+def get_credentials(client_secrets_file):
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
 
-    print(f"Zaktualizowano tytuł i opis w języku {language} ({LANG_MAP.get(language, language)}).")
-
-def get_authenticated_service(client_secrets_file):
     scopes = ["https://www.googleapis.com/auth/youtube.force-ssl"]
     credentials = None
 
@@ -185,172 +626,647 @@ def get_authenticated_service(client_secrets_file):
         with open("token.pickle", "wb") as token:
             pickle.dump(credentials, token)
 
-    return build("youtube", "v3", credentials=credentials)
+    return credentials
+
+def get_authenticated_service(client_secrets_file, credentials=None):
+    """
+    Klient YouTube Data API. Obiekt klienta nie jest bezpieczny wątkowo,
+    dlatego równolegle przetwarzane filmy budują własne klienty na wspólnych poświadczeniach
+    i wspólnym dokumencie discovery (wczytywanym raz na proces).
+    """
+    if credentials is None:
+        credentials = get_credentials(client_secrets_file)
+    return build_service(credentials)
+
+class SharedExtractor:
+    """
+    Jedna instancja yt_dlp.YoutubeDL do pobierania metadanych, współdzielona
+    przez wszystkie filmy (dostęp chroniony blokadą).
+    """
+
+    def __init__(self):
+        self._ydl = None
+        self._lock = threading.Lock()
+        # Wyniki ekstrakcji z list_videos dla adresów pojedynczych filmów - etap metadata ich nie powtarza
+        self._listed = {}
+
+    def _get_ydl(self):
+        # Wywoływane pod blokadą; yt_dlp jest wczytywany dopiero przy pierwszej ekstrakcji
+        if self._ydl is None:
+            import yt_dlp
+
+            self._ydl = yt_dlp.YoutubeDL({'quiet': True})
+        return self._ydl
+
+    def extract(self, url):
+        with self._lock:
+            info = self._listed.pop(url, None)
+            if info is not None:
+                return self._get_ydl().process_ie_result(info, download=False)
+            return self._get_ydl().extract_info(url, download=False)
+
+    def list_videos(self, url):
+        """Płaska ekstrakcja playlisty lub kanału - lista URL filmów bez pobierania szczegółów."""
+        from yt_dlp.extractor import get_info_extractor
+
+        # Adres pojedynczego filmu YouTube (bez parametru list) rozpoznajemy bez zapytań do sieci
+        if get_info_extractor('Youtube').suitable(url):
+            return [url]
+
+        with self._lock:
+            info = self._get_ydl().extract_info(url, download=False, process=False)
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                # Film z innego serwisu - nieprzetworzony wynik przyda się etapowi metadata
+                self._listed[url] = info
+                return [url]
+            return self._playlist_urls(info, depth=0)
+
+    def _playlist_urls(self, info, depth):
+        # Kanał bez zakładki (np. /@nazwa) to playlista zakładek (filmy, shorts, transmisje),
+        # więc zagnieżdżone playlisty są rozwijane - do dwóch poziomów w głąb
+        urls = []
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist' or 'playlist' in (entry.get('ie_key') or '').lower() \
+                    or entry.get('ie_key') == 'YoutubeTab':
+                if depth >= 2:
+                    continue
+                if entry.get('entries') is None:
+                    entry = self._get_ydl().extract_info(entry['url'], download=False, process=False)
+                nested = self._playlist_urls(entry, depth + 1)
+            else:
+                video_id = entry.get('id')
+                nested = [f"https://www.youtube.com/watch?v={video_id}" if video_id else entry.get('url')]
+            # Ten sam film może być w kilku zakładkach (np. transmisja także w filmach)
+            urls.extend(url for url in nested if url not in urls)
+        return urls
+
+    def close(self):
+        if self._ydl is not None:
+            self._ydl.close()
+
+def collect_batch_urls(source, extractor):
+    """
+    Lista filmów do przetworzenia w trybie wsadowym. `source` to URL playlisty/kanału
+    albo plik z adresami (jeden w linii, linie zaczynające się od # są pomijane).
+    """
+    if os.path.isfile(source):
+        with open(source, "r", encoding="utf-8") as f:
+            sources = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        sources = [source]
+
+    urls = []
+    for item in sources:
+        listed = extractor.list_videos(item)
+        if not listed:
+            # Pusta lista to zwykle zmiana formatu wyniku yt_dlp, a nie pusty kanał - nie przemilczamy jej
+            print(f"Uwaga: nie znaleziono żadnych filmów pod adresem {item}.", flush=True)
+        for url in listed:
+            if url and url not in urls:
+                urls.append(url)
+    return urls
 
 def main():
     parser = argparse.ArgumentParser(
         description='Pobieranie audio z YouTube, transkrypcja, tłumaczenia napisów/tytułu/opisu i publikacja w YouTube.'
     )
-    parser.add_argument('--url', required=True, help='URL do filmu na YouTube')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--url', help='URL do filmu na YouTube')
+    source.add_argument('--batch',
+                        help='Tryb wsadowy: URL playlisty/kanału albo plik z listą URL (jeden w linii).')
+    source.add_argument('--worker', action='store_true',
+                        help='Tryb pracy ciągłej: przetwarza zadania z kolejki --queue, aż do przerwania (Ctrl+C).')
+    parser.add_argument('--enqueue', action='store_true',
+                        help='Z --url/--batch: dodaje filmy do kolejki --queue zamiast je przetwarzać.')
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_PATH,
+                        help=f'Plik kolejki zadań SQLite (domyślnie {DEFAULT_QUEUE_PATH}).')
+    parser.add_argument('--poll-seconds', type=float, default=5.0,
+                        help='Tryb pracy ciągłej: co ile sekund sprawdzać kolejkę, gdy jest pusta (domyślnie 5).')
     parser.add_argument('--api', required=True, help='OpenAI API key')
     parser.add_argument('--lang', required=True, help='Lista kodów języków do tłumaczenia (np. en,de,zh)')
     parser.add_argument('--client_secrets', required=False, help='Ścieżka do pliku client_secrets.json')
     parser.add_argument('--upload', action='store_true',
                         help='Jeśli podane, to przesyłaj napisy i lokalizacje do YouTube.')
+    parser.add_argument('--jobs', type=int, default=4,
+                        help='Maksymalna liczba równoległych tłumaczeń (domyślnie 4).')
+    parser.add_argument('--videos', type=int, default=2,
+                        help='Tryb wsadowy: liczba filmów przetwarzanych jednocześnie (domyślnie 2).')
+    parser.add_argument('--chunk-tokens', type=int, default=1500,
+                        help='Przybliżony budżet tokenów jednego fragmentu SRT do tłumaczenia (domyślnie 1500).')
+    parser.add_argument('--segment-seconds', type=int, default=600,
+                        help='Docelowa długość fragmentu audio przy transkrypcji długich nagrań (domyślnie 600 s).')
+    parser.add_argument('--preprocess', action='store_true',
+                        help='Przed transkrypcją konwertuje audio do mono 16 kHz Opus (mniejsze przesyłanie do Whisper).')
+    parser.add_argument('--cut-silence', type=float, default=None,
+                        help='Z --preprocess: wycina ciszę dłuższą niż podana liczba sekund (czasy napisów są odtwarzane).')
+    parser.add_argument('--context-cues', type=int, default=2,
+                        help='Tłumaczenie przyrostowe: liczba sąsiednich napisów wysyłanych jako kontekst '
+                             'zmienionych napisów (domyślnie 2).')
+    parser.add_argument('--no-incremental', action='store_true',
+                        help='Po poprawce transkrypcji tłumaczy całe pliki zamiast tylko zmienionych napisów.')
+    parser.add_argument('--openai-batch', action='store_true',
+                        help='Tłumaczenie napisów jednym zleceniem OpenAI Batch API na film (taniej, wynik '
+                             'w ciągu do 24 godzin) zamiast zapytań na bieżąco.')
+    parser.add_argument('--batch-poll-seconds', type=float, default=DEFAULT_BATCH_POLL_SECONDS,
+                        help=f'Z --openai-batch: co ile sekund sprawdzać stan zlecenia (domyślnie {DEFAULT_BATCH_POLL_SECONDS}).')
+    parser.add_argument('--quota-limit', type=int, default=DEFAULT_DAILY_QUOTA,
+                        help=f'Dzienny limit jednostek YouTube Data API (domyślnie {DEFAULT_DAILY_QUOTA}).')
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR,
+                        help=f'Katalog z katalogami roboczymi filmów (domyślnie {DEFAULT_WORK_DIR}/<video_id>).')
+    parser.add_argument('--manifest-dir', default=DEFAULT_MANIFEST_DIR,
+                        help=f'Katalog manifestów zadań do wznawiania przerwanych przebiegów (domyślnie {DEFAULT_MANIFEST_DIR}).')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Ignoruje zapisany manifest i przetwarza film od początku.')
+    parser.add_argument('--openai-base-url', default=None,
+                        help='Alternatywny adres API OpenAI (np. lokalny serwer testowy).')
+    parser.add_argument('--rpm', type=int, default=DEFAULT_RPM,
+                        help=f'Startowy limit zapytań OpenAI na minutę na model (domyślnie {DEFAULT_RPM}); '
+                             'korygowany nagłówkami x-ratelimit-*.')
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TPM,
+                        help=f'Startowy limit tokenów OpenAI na minutę na model (domyślnie {DEFAULT_TPM}).')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f'Ścieżka do pliku cache tłumaczeń (domyślnie {DEFAULT_CACHE_PATH}).')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Wyłącza cache tłumaczeń.')
+    parser.add_argument('--report', default='run_report.json',
+                        help='Plik raportu JSON z metrykami etapów: czas, bajty, tokeny, wywołania i ponowienia API '
+                             '(domyślnie run_report.json).')
+    parser.add_argument('--prometheus', default=None,
+                        help='Dodatkowy zapis metryk w formacie tekstowym Prometheus (np. dla node_exporter).')
+    parser.add_argument('--profile', default=None,
+                        help='Uruchamia profiler próbkujący i zapisuje stosy (format collapsed) do podanego pliku.')
     args = parser.parse_args()
 
-    client = OpenAI(api_key=args.api)
-    target_langs = args.lang.split(',')
+    if args.enqueue:
+        if args.worker:
+            parser.error("--enqueue wymaga --url albo --batch.")
+        enqueue_jobs(args)
+        return
+
+    def create_openai_client():
+        from openai import OpenAI
+
+        # Ponawianiem po 429 i po błędach przejściowych zajmuje się RateLimitedClient, a nie biblioteka openai
+        return OpenAI(api_key=args.api, base_url=args.openai_base_url, max_retries=0)
+
+    client = RateLimitedClient(client_factory=create_openai_client, rpm=args.rpm, tpm=args.tpm)
+    cache = None if args.no_cache else TranslationCache(args.cache)
+    extractor = SharedExtractor()
+    credentials = get_credentials(args.client_secrets) if args.upload else None
+    planner = QuotaPlanner(daily_limit=args.quota_limit) if args.upload else None
+    profiler = SamplingProfiler() if args.profile else None
+    if profiler is not None:
+        profiler.start()
+
+    try:
+        if args.worker:
+            run_worker(args, client, cache, extractor, credentials, planner)
+        elif args.batch:
+            run_batch(args, client, cache, extractor, credentials, planner)
+        else:
+            if planner is not None:
+                print_quota_plan(planner, 1, args.lang.split(','))
+            try:
+                with METRICS.video(video_id_from_url(args.url)):
+                    _, timings = run_stages(build_stages(args.url, args, client, cache, extractor, credentials,
+                                                         planner), max_workers=args.jobs)
+            except StageError as e:
+                print(format_timings(e.timings))
+                raise SystemExit(f"Przetwarzanie przerwane. {e}")
+            print(format_timings(timings))
+    finally:
+        extractor.close()
+        print(client.summary())
+        if args.upload:
+            print(API_STATS.summary())
+        write_run_report(args, client)
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(args.profile)
+            print(profiler.summary())
+            print(f"Stosy profilera zapisane w {args.profile} (format collapsed, np. dla speedscope).")
+
+    if args.upload:
+        print("Zakończono przetwarzanie (tryb z przesyłaniem do YouTube).")
+    else:
+        print("Zakończono przetwarzanie (tryb bez przesyłania do YouTube).")
 
-    print("Pobieranie informacji o filmie (tytuł, opis) za pomocą yt_dlp...", flush=True)
-    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-        info = ydl.extract_info(args.url, download=False)
+def write_run_report(args, client):
+    """Zapis metryk przebiegu (JSON i opcjonalnie Prometheus) razem z ustawieniami i limitami API."""
+    settings = {key: value for key, value in vars(args).items() if key != "api"}
+    rate_limits = {model: {"calls": limits.calls, "rate_limited": limits.rate_limited,
+                           "rpm_wait_seconds": round(limits.requests.waited, 3),
+                           "tpm_wait_seconds": round(limits.tokens.waited, 3)}
+                   for model, limits in client.models.items()}
+    METRICS.write_json(args.report, settings=settings, openai_rate_limits=rate_limits,
+                       youtube_api=API_STATS.calls)
+    print(f"Raport metryk zapisany w {args.report}.")
+    if args.prometheus:
+        METRICS.write_prometheus(args.prometheus)
+
+def print_quota_plan(planner, video_count, target_langs):
+    """Oszacowanie kosztu publikacji w jednostkach YouTube Data API przed uruchomieniem."""
+    # Napisy polskie są zawsze publikowane, nawet jeśli 'pl' nie ma na liście języków
+    per_video = estimate_video_cost(len(set(target_langs) | {"pl"}))
+    remaining = planner.remaining()
+    print(f"Szacowany koszt publikacji: do {per_video * video_count} jednostek limitu YouTube "
+          f"({video_count} film(ów) x {per_video}); dziś zostało {remaining}/{planner.daily_limit}.", flush=True)
+    if per_video * video_count > remaining:
+        print(f"Limit może nie wystarczyć - filmy ponad limit zostaną odłożone do {planner.deferred_file}.",
+              flush=True)
+
+def run_batch(args, client, cache, extractor, credentials, planner=None):
+    """
+    Przetwarzanie wielu filmów (playlista, kanał lub plik z adresami) przy
+    współdzielonym kliencie OpenAI i ekstraktorze yt_dlp. Jednocześnie
+    przetwarzanych jest co najwyżej `--videos` filmów. Na końcu drukowane
+    jest podsumowanie statusu każdego filmu.
+    """
+    urls = collect_batch_urls(args.batch, extractor)
+    print(f"Tryb wsadowy: {len(urls)} filmów do przetworzenia.", flush=True)
+    if planner is not None:
+        print_quota_plan(planner, len(urls), args.lang.split(','))
+
+    summary = {}
+    with ThreadPoolExecutor(max_workers=max(1, args.videos)) as executor:
+        futures = {executor.submit(process_video, url, args, client, cache, extractor, credentials, planner): url
+                   for url in urls}
+        for future in as_completed(futures):
+            summary[futures[future]] = future.result()
+            print(f"[{len(summary)}/{len(urls)}] {futures[future]}: {summary[futures[future]][0]}", flush=True)
+
+    print("\nPodsumowanie trybu wsadowego:")
+    for url in urls:
+        status, elapsed, details = summary[url]
+        print(f"  {status:<9} {elapsed:8.1f} s  {url}" + (f"  ({details})" if details else ""))
+    failed = sum(1 for status, _, _ in summary.values() if status != "ok")
+    if planner is not None and any(status == "odroczony" for status, _, _ in summary.values()):
+        print(f"Odroczone filmy zapisano w {planner.deferred_file}.")
+    print(f"Przetworzono {len(urls) - failed}/{len(urls)} filmów bez błędów.")
+    return summary
+
+def process_video(url, args, client, cache, extractor, credentials=None, planner=None):
+    """Przetworzenie jednego filmu w trybie wsadowym lub ciągłym: (status, czas, szczegóły)."""
+    started = time.monotonic()
+    try:
+        with METRICS.video(video_id_from_url(url)):
+            run_stages(build_stages(url, args, client, cache, extractor, credentials, planner),
+                       max_workers=args.jobs)
+    except StageError as e:
+        if any(isinstance(error, QuotaExceeded) for error in e.failures.values()):
+            return "odroczony", time.monotonic() - started, "brak limitu YouTube API"
+        return "błąd", time.monotonic() - started, str(e)
+    except Exception as e:
+        return "błąd", time.monotonic() - started, str(e)
+    return "ok", time.monotonic() - started, ""
+
+def enqueue_jobs(args):
+    """Dodanie filmów z --url/--batch do kolejki trybu pracy ciągłej (z językami z --lang)."""
+    if args.url:
+        urls = [args.url]
+    else:
+        extractor = SharedExtractor()
+        try:
+            urls = collect_batch_urls(args.batch, extractor)
+        finally:
+            extractor.close()
+    queue = JobQueue(args.queue)
+    for url in urls:
+        queue.add(url, lang=args.lang)
+    print(f"Dodano {len(urls)} zadań do kolejki {args.queue}. Stan kolejki: {queue.counts()}")
+    queue.close()
+
+# Ustawienia, które zadanie w kolejce może nadpisać względem ustawień procesu roboczego
+JOB_OPTIONS = {"lang", "chunk_tokens", "segment_seconds", "preprocess", "cut_silence", "fresh", "openai_batch"}
+
+# Proces roboczy działa bez końca - raport przebiegu trzyma szczegóły tylko ostatnich filmów (sumy są pełne)
+WORKER_METRICS_VIDEOS = 50
+
+def run_worker(args, client, cache, extractor, credentials, planner=None):
+    """
+    Tryb pracy ciągłej: proces pobiera zadania z kolejki SQLite i przetwarza
+    do `--videos` filmów naraz. Klient OpenAI, cache tłumaczeń, ekstraktor
+    yt_dlp, poświadczenia Google i dokument discovery YouTube powstają raz
+    na proces, więc koszt uruchomienia nie powtarza się dla każdego filmu.
+    Ctrl+C (lub SIGTERM) kończy pobieranie nowych zadań i czeka na bieżące.
+    Raport przebiegu zawiera szczegóły tylko ostatnich WORKER_METRICS_VIDEOS filmów.
+    """
+    METRICS.max_videos = WORKER_METRICS_VIDEOS
+    queue = JobQueue(args.queue)
+    restored = queue.requeue_interrupted()
+    if restored:
+        print(f"Przywrócono do kolejki {restored} przerwanych zadań.", flush=True)
+    print(f"Tryb pracy ciągłej: kolejka {args.queue}, do {args.videos} filmów naraz. Stan: {queue.counts()}",
+          flush=True)
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print("Zatrzymywanie - oczekiwanie na zakończenie bieżących zadań...", flush=True)
+        stop.set()
+
+    previous_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+    statuses = {"ok": DONE, "odroczony": DEFERRED, "błąd": FAILED}
+
+    def process_job(job):
+        job_id, url, options = job
+        job_args = argparse.Namespace(**dict(vars(args), **{key: value for key, value in options.items()
+                                                            if key in JOB_OPTIONS}))
+        print(f"Zadanie {job_id}: {url}", flush=True)
+        try:
+            status, elapsed, details = process_video(url, job_args, client, cache, extractor, credentials, planner)
+            queue.finish(job_id, statuses[status], details or None)
+            print(f"Zadanie {job_id}: {status} ({elapsed:.1f} s){f' - {details}' if details else ''}", flush=True)
+            write_run_report(args, client)
+        except Exception as e:
+            # Wyjątek z wątku puli nikt by nie odczytał - zadanie zostałoby zajęte bez śladu błędu
+            print(f"Zadanie {job_id}: błąd procesu roboczego: {e}", flush=True)
+            try:
+                queue.finish(job_id, FAILED, f"błąd procesu roboczego: {e}")
+            except Exception as finish_error:
+                print(f"Zadanie {job_id}: nie udało się oznaczyć jako nieudane ({finish_error}).", flush=True)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.videos)) as executor:
+            running = set()
+            while not stop.is_set():
+                while len(running) < max(1, args.videos):
+                    job = queue.claim()
+                    if job is None:
+                        break
+                    running.add(executor.submit(process_job, job))
+                if running:
+                    _, running = wait(running, timeout=args.poll_seconds, return_when=FIRST_COMPLETED)
+                else:
+                    stop.wait(args.poll_seconds)
+            wait(running)
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+        print(f"Tryb pracy ciągłej zakończony. Stan kolejki: {queue.counts()}")
+        queue.close()
+
+def video_id_from_url(url):
+    if "v=" in url:
+        return url.split("v=")[-1]
+    return url.split("/")[-1]
+
+def build_stages(url, args, client, cache, extractor, credentials=None, planner=None, youtube=None):
+    """
+    Potok przetwarzania jednego filmu jako graf etapów.
+    Tłumaczenie tytułu i opisu, uwierzytelnienie oraz pobranie listy istniejących
+    napisów nie czekają na pobranie audio i transkrypcję. Metadane są pobierane
+    raz (przez współdzielony `extractor`) i ponownie używane przy pobieraniu audio.
+    Wywołania YouTube API jednego filmu są wykonywane po kolei, bo klient
+    googleapiclient nie jest bezpieczny wątkowo. Jeśli podano `planner`, przed
+    publikacją rezerwowany jest limit API, a przy jego braku film jest odkładany.
+    Ukończone etapy są zapisywane w manifeście zadania (--manifest-dir), więc
+    ponowne uruchomienie wznawia pracę od pierwszego nieukończonego etapu.
+    Wszystkie pliki filmu trafiają do jego katalogu roboczego (--work-dir/<video_id>)
+    i są odnajdywane po kluczach z indeksu, a nie przez przeszukiwanie katalogu.
+    Gotowy klient YouTube (`youtube`, np. atrapa w benchmark.py) zastępuje uwierzytelnienie.
+    """
+    target_langs = args.lang.split(',')
+    video_id = video_id_from_url(url)
+    manifest = JobManifest.for_video(video_id, args.manifest_dir)
+    workspace = Workspace.for_video(video_id, args.work_dir)
+    if args.fresh:
+        manifest.stages = {}
+
+    def metadata(_):
+        if manifest.done("metadata"):
+            print("Metadane filmu z manifestu - pomijanie ekstrakcji.", flush=True)
+            return manifest.data("metadata")
+
+        print("Pobieranie informacji o filmie (tytuł, opis) za pomocą yt_dlp...", flush=True)
+        info = extractor.extract(url)
         raw_title = info.get('title', 'unknown_title')
         raw_description = info.get('description', '')
 
-    # Uporządkowana nazwa (bez znaków specjalnych)
-    safe_title = re.sub(r'[^\w\s-]', '', raw_title).replace(' ', '_')
-
-    # Zapis oryginalnego tytułu i opisu (polski)
-    title_file_pl = f"{safe_title}.title.pl"
-    desc_file_pl = f"{safe_title}.description.pl"
-
-    with open(title_file_pl, "w", encoding="utf-8") as f:
-        f.write(raw_title)
-    with open(desc_file_pl, "w", encoding="utf-8") as f:
-        f.write(raw_description)
-
-    # Pobranie i zapis audio
-    output_template = f"{safe_title}.%(ext)s"
-    ydl_opts = {
-        'format': '140',
-        'outtmpl': output_template,
-        'noplaylist': True,
-        'progress_hooks': [download_hook]
-    }
-
-    print("Rozpoczynanie pobierania pliku audio z YouTube...", flush=True)
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        new_info = ydl.extract_info(args.url, download=True)
-        audio_file_name = ydl.prepare_filename(new_info)
-
-    print("\nPobieranie zakończone. Przechodzenie do transkrypcji...\n", flush=True)
-    srt_file_name = f"{safe_title}.srt.pl"
-    with open(audio_file_name, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            response_format="srt"
-        )
-    with open(srt_file_name, "w", encoding="utf-8") as f:
-        f.write(transcript)
-
-    print(f"Transkrypcja zapisana w pliku: {srt_file_name}")
-
-    # Przeniesienie pliku audio do osobnego katalogu
-    audio_dir = "audio"
-    if not os.path.exists(audio_dir):
-        os.makedirs(audio_dir)
-    destination_path = os.path.join(audio_dir, os.path.basename(audio_file_name))
-    shutil.move(audio_file_name, destination_path)
-    print(f"Plik audio został przeniesiony do katalogu: {destination_path}")
-
-    # Tłumaczenie pliku SRT
-    translate_srt(srt_file_name, target_langs, client)
-
-    # Tłumaczenie tytułu i opisu na wybrane języki (POMIJAMY 'pl')
-    translated_titles = {}
-    translated_descriptions = {}
-
-    for lang in target_langs:
-        if lang == 'pl':  # Pomijamy polski
-            continue
-        
-        translated_title = translate_text_ignoring_urls(raw_title, lang, client)
-        translated_description = translate_text_ignoring_urls(raw_description, lang, client)
-
-        # Zapis do plików
-        title_file_lang = f"{safe_title}.title.{lang}"
-        desc_file_lang = f"{safe_title}.description.{lang}"
-
-        with open(title_file_lang, "w", encoding="utf-8") as f:
-            f.write(translated_title)
-        with open(desc_file_lang, "w", encoding="utf-8") as f:
-            f.write(translated_description)
+        # Uporządkowana nazwa (bez znaków specjalnych)
+        safe_title = re.sub(r'[^\w\s-]', '', raw_title).replace(' ', '_')
+
+        # Zapis oryginalnego tytułu i opisu (polski)
+        title_file = workspace.write_text("title:pl", f"{safe_title}.title.pl", raw_title)
+        desc_file = workspace.write_text("description:pl", f"{safe_title}.description.pl", raw_description)
+
+        manifest.complete("metadata", [title_file, desc_file],
+                          title=raw_title, description=raw_description, safe_title=safe_title)
+        return {"title": raw_title, "description": raw_description, "safe_title": safe_title, "info": info}
+
+    def transcript_ready():
+        # Istniejąca transkrypcja jest zachowywana także po ręcznej poprawce (inny skrót pliku)
+        data = manifest.data("transcript")
+        return data is not None and os.path.exists(data["path"])
+
+    def download(deps):
+        # Transkrypcja gotowa - audio nie jest już potrzebne
+        if transcript_ready():
+            return None
+        if manifest.done("audio"):
+            print("Plik audio z manifestu - pomijanie pobierania.", flush=True)
+            return manifest.data("audio")["path"]
+
+        # Pobranie i zapis audio
+        ydl_opts = {
+            'format': '140',
+            'outtmpl': workspace.path(f"{deps['metadata']['safe_title']}.%(ext)s"),
+            'noplaylist': True,
+            'progress_hooks': [download_hook]
+        }
 
-        translated_titles[lang] = translated_title
-        translated_descriptions[lang] = translated_description
+        import yt_dlp
+
+        print("Rozpoczynanie pobierania pliku audio z YouTube...", flush=True)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # Ponowne użycie metadanych z etapu "metadata" zamiast drugiej ekstrakcji
+            info = deps['metadata'].get('info') or extractor.extract(url)
+            new_info = ydl.process_ie_result(dict(info), download=True)
+            audio_file_name = workspace.add("audio", ydl.prepare_filename(new_info))
+        record(bytes_in=os.path.getsize(audio_file_name))
+
+        manifest.complete("audio", [audio_file_name], path=audio_file_name)
+        return audio_file_name
+
+    def transcribe(deps):
+        if transcript_ready():
+            srt_file_name = manifest.data("transcript")["path"]
+            if manifest.done("transcript"):
+                print("Transkrypcja z manifestu - pomijanie Whisper.", flush=True)
+            else:
+                print(f"Transkrypcja {srt_file_name} została poprawiona ręcznie - używanie poprawionej wersji.",
+                      flush=True)
+                manifest.complete("transcript", [srt_file_name], path=srt_file_name)
+            return srt_file_name
+
+        audio_file_name = deps['download']
+        print("\nPobieranie zakończone. Przechodzenie do transkrypcji...\n", flush=True)
+        has_ffmpeg = shutil.which("ffmpeg") is not None
+        time_map = []
+        if args.preprocess and has_ffmpeg:
+            speech_file = workspace.path(f"{deps['metadata']['safe_title']}.speech.ogg")
+            audio_file_name, time_map = preprocess_audio(audio_file_name, speech_file, cut_silence=args.cut_silence)
+            workspace.add("audio:speech", audio_file_name)
+        elif args.preprocess:
+            print("Brak ffmpeg - pomijanie przygotowania audio.", flush=True)
+
+        if has_ffmpeg and needs_segmenting(audio_file_name, args.segment_seconds):
+            transcript = transcribe_segmented(audio_file_name, client,
+                                              segment_seconds=args.segment_seconds, jobs=args.jobs)
+        else:
+            transcript = transcribe_file(audio_file_name, client)
+        if time_map:
+            # Napisy wracają na oś czasu oryginalnego nagrania
+            transcript = format_srt(remap_cues(parse_srt(transcript), time_map))
+        srt_file_name = workspace.write_text("srt:pl", f"{deps['metadata']['safe_title']}.srt.pl", transcript)
+
+        print(f"Transkrypcja zapisana w pliku: {srt_file_name}")
+        manifest.complete("transcript", [srt_file_name], path=srt_file_name)
+        return srt_file_name
+
+    def translate_captions(deps):
+        srt_file_name = deps['transcribe']
+        source_hash = file_sha256(srt_file_name)
+        # Transkrypcja jest już po polsku - nie tłumaczymy jej na polski
+        srt_langs = [lang for lang in target_langs if lang != 'pl']
+
+        # Języki przetłumaczone już z tej samej transkrypcji są pomijane
+        pending_langs = [lang for lang in srt_langs if not manifest.done(f"srt:{lang}", source=source_hash)]
+        if len(pending_langs) < len(srt_langs):
+            print(f"Napisy z manifestu dla języków: "
+                  f"{', '.join(lang for lang in srt_langs if lang not in pending_langs)}.", flush=True)
+
+        # Wersja źródła, z której powstało istniejące tłumaczenie - podstawa tłumaczenia przyrostowego
+        previous = {}
+        if not args.no_incremental:
+            previous = {lang: workspace.get(f"source:{lang}") for lang in pending_langs
+                        if workspace.get(f"source:{lang}")}
+
+        failed_langs = translate_srt(srt_file_name, pending_langs, client,
+                                     jobs=args.jobs, chunk_tokens=args.chunk_tokens, cache=cache,
+                                     previous=previous, context_cues=args.context_cues,
+                                     batch_api=args.openai_batch, poll_seconds=args.batch_poll_seconds)
+        with open(srt_file_name, "r", encoding="utf-8") as f:
+            source_text = f.read()
+        base_name = os.path.splitext(os.path.basename(srt_file_name))[0]
+        for lang in pending_langs:
+            caption_file = f"{os.path.splitext(srt_file_name)[0]}.{lang}.srt"
+            if lang not in failed_langs and os.path.exists(caption_file):
+                workspace.add(f"srt:{lang}", caption_file)
+                workspace.write_text(f"source:{lang}", f"{base_name}.{lang}.source", source_text)
+                manifest.complete(f"srt:{lang}", [caption_file], source=source_hash)
+        if failed_langs:
+            print(f"Nie udało się przetłumaczyć napisów na języki: {', '.join(sorted(failed_langs))}")
+        return srt_file_name
+
+    def localize(deps):
+        # Tłumaczenie tytułu i opisu na wybrane języki (POMIJAMY 'pl')
+        meta = deps['metadata']
+        source_hash = text_sha256(meta['title'] + "\n" + meta['description'])
+
+        localized = {}
+        pending_langs = []
+        for lang in target_langs:
+            if lang == 'pl':
+                continue
+            if manifest.done(f"localize:{lang}", source=source_hash):
+                data = manifest.data(f"localize:{lang}")
+                localized[lang] = {"title": data["title"], "description": data["description"]}
+            else:
+                pending_langs.append(lang)
+
+        for lang, texts in localize_metadata(meta['title'], meta['description'], pending_langs,
+                                             client, cache=cache).items():
+            title_file = workspace.write_text(f"title:{lang}", f"{meta['safe_title']}.title.{lang}", texts["title"])
+            desc_file = workspace.write_text(f"description:{lang}", f"{meta['safe_title']}.description.{lang}",
+                                             texts["description"])
+            manifest.complete(f"localize:{lang}", [title_file, desc_file], source=source_hash, **texts)
+            localized[lang] = texts
+        return localized
+
+    def export(_):
+        # Kopie wyników w dotychczasowych katalogach srt/, title/, description/ i audio/
+        workspace.export()
+        print(f"Wyniki w katalogu roboczym {workspace.root} (indeks: {workspace.index_path}); "
+              "kopie w katalogach srt/, title/, description/ i audio/.")
+
+    stages = [
+        Stage("metadata", metadata, []),
+        Stage("download", download, ["metadata"]),
+        Stage("transcribe", transcribe, ["download", "metadata"]),
+        Stage("translate_srt", translate_captions, ["transcribe"]),
+        Stage("localize", localize, ["metadata"]),
+        Stage("export", export, ["translate_srt", "localize"]),
+    ]
 
     # Jeśli nie ma parametru --upload, kończymy tylko na zapisie plików
     if not args.upload:
-        print("Zakończono przetwarzanie (tryb bez przesyłania do YouTube).")
-        
-        # ---- DODAJEMY PRZENOSZENIE PLIKÓW DO OSOBNYCH KATALOGÓW ----
-        move_output_files()
-        return
-
-    # Poniżej sekcja wysyłania napisów i aktualizacji tytułów/opisów w YouTube
-    if "v=" in args.url:
-        video_id = args.url.split("v=")[-1]
-    else:
-        video_id = args.url.split("/")[-1]
-
-    youtube = get_authenticated_service(args.client_secrets)
-
-    # Najpierw publikujemy (lub nadpisujemy) napisy w języku polskim (oryginalne SRT).
-    upload_caption(youtube, video_id, "pl", srt_file_name)
-
-    # Następnie napisy w pozostałych językach (i ewentualnie ich lokalizacje)
-    for lang in target_langs:
-        if lang != "pl":
-            caption_file = f"{os.path.splitext(srt_file_name)[0]}.{lang}.srt"
-            if os.path.exists(caption_file):
-                upload_caption(youtube, video_id, lang, caption_file)
-    
-    # Dodajemy lokalizacje tytułu i opisu TYLKO dla języków innych niż polski
-    for lang in target_langs:
-        if lang == 'pl':
-            continue  # Pomijamy polskie localizations
-        if lang in translated_titles and lang in translated_descriptions:
-            update_video_localizations(
-                youtube,
-                video_id,
-                lang,
-                translated_titles[lang],
-                translated_descriptions[lang]
-            )
-
-    print("Zakończono przetwarzanie (tryb z przesyłaniem do YouTube).")
-    
-    # ---- DODAJEMY PRZENOSZENIE PLIKÓW DO OSOBNYCH KATALOGÓW ----
-    move_output_files()
-
-
-def move_output_files():
-    """
-    Tworzy katalogi: srt, title, description.
-    Przenosi wszystkie pliki SRT, tytułów i opisów do odpowiednich katalogów.
-    """
-    # Tworzenie katalogów, jeśli nie istnieją
-    os.makedirs("srt", exist_ok=True)
-    os.makedirs("title", exist_ok=True)
-    os.makedirs("description", exist_ok=True)
-
-    # Przeglądamy aktualny folder i przenosimy pliki
-    for file in os.listdir("."):
-        # SRT-y: oryginalne i tłumaczenia (np. .srt, .srt.pl, .srt.en)
-        if file.endswith(".srt") or ".srt." in file:
-            shutil.move(file, os.path.join("srt", file))
-
-        # Pliki tytułów
-        elif ".title." in file or file.endswith(".title.pl"):
-            shutil.move(file, os.path.join("title", file))
-
-        # Pliki opisów
-        elif ".description." in file or file.endswith(".description.pl"):
-            shutil.move(file, os.path.join("description", file))
-
-    print("Przeniesiono pliki SRT, tytułów oraz opisów do katalogów: srt/, title/ i description/.")
+        return stages
+
+    # Komplet napisów, jaki zostanie opublikowany, jeśli wszystkie tłumaczenia się udadzą
+    expected_caption_langs = sorted({"pl"} | {lang for lang in target_langs if lang in LANG_MAP})
+
+    def authenticate(_):
+        if youtube is not None:
+            return youtube
+        return get_authenticated_service(args.client_secrets, credentials)
+
+    def existing_captions(deps):
+        if manifest.done("upload:captions", langs=expected_caption_langs):
+            return None
+        if planner is not None:
+            planner.require(QUOTA_COSTS["captions.list"], url)
+        return get_existing_captions(deps['auth'], video_id)
+
+    def upload_captions(deps):
+        # Oryginalne napisy polskie oraz przetłumaczone pliki w pozostałych językach
+        caption_files = {"pl": deps['translate_srt']}
+        for lang in target_langs:
+            if lang != "pl" and workspace.get(f"srt:{lang}"):
+                caption_files[lang] = workspace.get(f"srt:{lang}")
+
+        if manifest.done("upload:captions", langs=sorted(caption_files)):
+            print("Napisy zostały już opublikowane (manifest) - pomijanie.", flush=True)
+            return {lang: "skip" for lang in caption_files}
+
+        existing = deps['existing_captions']
+        if existing is None:
+            if planner is not None:
+                planner.require(QUOTA_COSTS["captions.list"], url)
+            existing = get_existing_captions(deps['auth'], video_id)
+
+        actions, to_delete = plan_caption_sync(video_id, caption_files, existing)
+
+        # Rezerwujemy limit na napisy i (jeśli są) lokalizacje, zanim cokolwiek wyślemy
+        if planner is not None:
+            cost = caption_sync_cost(actions, to_delete)
+            if deps['localize']:
+                cost += QUOTA_COSTS["videos.list"] + QUOTA_COSTS["videos.update"]
+            planner.require(cost, url)
+
+        statuses = sync_captions(deps['auth'], video_id, actions, to_delete)
+        manifest.complete("upload:captions", list(caption_files.values()), langs=sorted(caption_files))
+        return statuses
+
+    def upload_localizations(deps):
+        # Dodajemy lokalizacje tytułu i opisu TYLKO dla języków innych niż polski
+        if not deps['localize']:
+            return
+        localized_hash = text_sha256(json.dumps(deps['localize'], sort_keys=True, ensure_ascii=False))
+        if manifest.done("upload:localizations", source=localized_hash):
+            print("Lokalizacje zostały już opublikowane (manifest) - pomijanie.", flush=True)
+            return
+        update_video_localizations(deps['auth'], video_id, deps['localize'])
+        manifest.complete("upload:localizations", source=localized_hash)
+
+    return stages + [
+        Stage("auth", authenticate, []),
+        Stage("existing_captions", existing_captions, ["auth"]),
+        Stage("upload_captions", upload_captions, ["auth", "existing_captions", "translate_srt", "localize"]),
+        Stage("localizations", upload_localizations, ["auth", "localize", "upload_captions"]),
+    ]
 
 
 if __name__ == '__main__':